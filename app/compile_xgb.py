@@ -0,0 +1,48 @@
+"""
+Compile the XGBoost ensemble member to a native shared library with treelite/tl2cgen
+so the API can traverse its trees without the XGBoost runtime. Needs a C compiler.
+Re-run after retraining; the API ignores libraries that are older than the pickle.
+
+    python -m app.compile_xgb
+"""
+
+import os
+import sys
+import joblib
+import treelite
+import tl2cgen
+
+BASE_DIR = os.path.dirname(os.path.dirname(__file__))  # project root
+MODELS_DIR = os.path.join(BASE_DIR, "models")
+
+# Must match XGB_LIB_SUFFIX in app/main.py
+XGB_LIB_SUFFIX = {"win32": ".dll", "darwin": ".dylib"}.get(sys.platform, ".so")
+
+
+def compile_xgb(models_dir: str = MODELS_DIR, parallel_comp: int = 4) -> str:
+    """Compile models/xgb_model.pkl to models/xgb_model<XGB_LIB_SUFFIX>"""
+    xgb_model = joblib.load(os.path.join(models_dir, "xgb_model.pkl"))
+    tree_model = treelite.frontend.from_xgboost(xgb_model.get_booster())
+
+    lib_path = os.path.join(models_dir, f"xgb_model{XGB_LIB_SUFFIX}")
+    toolchain = "msvc" if sys.platform == "win32" else "gcc"
+    # parallel_comp splits the generated C over several files so they compile concurrently
+    tl2cgen.export_lib(tree_model, toolchain=toolchain, libpath=lib_path, params={"parallel_comp": parallel_comp})
+    return lib_path
+
+
+def main():
+    """Main entry point"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Compile the FraudDetectPro XGBoost model to a native library')
+    parser.add_argument('--models-dir', default=MODELS_DIR, help='Directory holding the model pickles')
+    parser.add_argument('--parallel-comp', type=int, default=4, help='Number of C source files to split the trees into')
+    args = parser.parse_args()
+
+    lib_path = compile_xgb(args.models_dir, args.parallel_comp)
+    print(f"✅ Compiled xgb_model -> {lib_path}")
+
+
+if __name__ == "__main__":
+    main()
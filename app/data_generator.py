@@ -3,14 +3,24 @@ Synthetic Transaction Data Generator for FraudDetectPro
 Generates realistic transaction data and sends to API every minute
 """
 
+import asyncio
+import collections
+import functools
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
-import pandas as pd
 import requests
+from requests.adapters import HTTPAdapter
+import httpx
+import orjson
 import time
 import logging
+import logging.handlers
+import atexit
+import queue
+import math
+import threading
 from datetime import datetime
-from typing import Dict, List
-import json
+from typing import Dict, List, Optional
 import os
 from dotenv import load_dotenv
 
@@ -23,6 +33,37 @@ GENERATION_INTERVAL = 60  # seconds (1 minute)
 BATCH_SIZE = 20  # Generate 10 transactions per batch
 FRAUD_RATIO = 0.05  # 5% fraud rate (can be adjusted via --fraud-ratio argument)
 
+# Payloads are encoded with orjson (feature rows are serialized straight from numpy)
+JSON_HEADERS = {'Content-Type': 'application/json'}
+JSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY
+
+# Reference dataset used to sample realistic fraud/ambiguous transactions
+DATA_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'raw', 'creditcard.csv')
+FEATURE_COLUMNS = ['Time'] + [f'V{i}' for i in range(1, 29)] + ['Amount']
+TRANSACTION_ID_PREFIX = 'SYNTH_'
+
+# Standard normals drawn per buffer refill (enough for 4096 rows of V1-V28)
+NORMAL_BUFFER_SIZE = 4096 * 28
+
+# Upper bound on in-flight prediction requests (connection pool size); this paces
+# the sender instead of sleeping between requests
+MAX_CONCURRENT_REQUESTS = 32
+
+# Results kept in memory when they are streamed to an NDJSON file instead
+RESULTS_WINDOW = 1000
+
+# Streamed results are written through a 64 KiB buffer that a background thread
+# flushes every RESULTS_FLUSH_INTERVAL seconds
+RESULTS_FILE = 'synthetic_results.ndjson'
+RESULTS_BUFFER_SIZE = 1 << 16
+RESULTS_FLUSH_INTERVAL = 1.0
+
+# Background API health polling during continuous runs: steady interval while the
+# API is up, exponential backoff between these bounds while it is down
+HEALTH_POLL_INTERVAL = 5.0
+HEALTH_RETRY_MIN = 1.0
+HEALTH_RETRY_MAX = 30.0
+
 # Setup logging with UTF-8 support for Windows console
 import sys
 import io
@@ -50,24 +91,212 @@ class SafeStreamHandler(logging.StreamHandler):
 file_handler = logging.FileHandler('synthetic_generator.log', encoding='utf-8')
 stream_handler = SafeStreamHandler(sys.stdout)
 
+log_formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+file_handler.setFormatter(log_formatter)
+stream_handler.setFormatter(log_formatter)
+
+# Records are queued and written by a background listener thread, so file
+# and console I/O stay off the request-sending path
+log_queue = queue.SimpleQueue()
+queue_handler = logging.handlers.QueueHandler(log_queue)
+queue_handler.setFormatter(logging.Formatter('%(message)s'))
+log_listener = logging.handlers.QueueListener(log_queue, file_handler, stream_handler)
+log_listener.start()
+atexit.register(log_listener.stop)
+
 logging.basicConfig(
     level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[file_handler, stream_handler]
+    handlers=[queue_handler]
 )
 logger = logging.getLogger(__name__)
 
+# Check for Numba availability (JIT kernels for the pure-numeric generation paths)
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+    logger.warning("Numba not available - falling back to NumPy generation kernels")
+
+
+def _scaled_normals_numpy(z, means, stds, low, high, out):
+    """out = clip(means + stds * z, low, high) for (n, 28) standard normals z"""
+    np.clip(means + stds * z, low, high, out=out)
+
+
+def _synthetic_fraud_v_numpy(u, z_outlier, z_normal, means, stds, out):
+    """Synthetic fraud V features: 50% outliers ~ N(0, 4), the rest ~ N(means, 1.5 * stds)"""
+    out[:] = np.where(u < 0.5, 4.0 * z_outlier, means + stds * 1.5 * z_normal)
+
+
+def _extreme_fraud_v_numpy(u_extreme, z_scale, u_push, z_noise, v):
+    """In place on real fraud V features: 40% are scaled (and pushed out if still small), the rest get noise"""
+    scaled = v * (1 + 0.5 * z_scale)
+    scaled = np.where(np.abs(scaled) < 2, scaled * (2 + u_push * 2), scaled)
+    v[:] = np.where(u_extreme < 0.4, scaled, v + 0.3 * z_noise)
+
+
+if NUMBA_AVAILABLE:
+    @njit(cache=True, fastmath=True)
+    def _scaled_normals(z, means, stds, low, high, out):
+        for i in range(z.shape[0]):
+            for j in range(z.shape[1]):
+                out[i, j] = min(max(means[j] + stds[j] * z[i, j], low), high)
+    
+    @njit(cache=True, fastmath=True)
+    def _synthetic_fraud_v(u, z_outlier, z_normal, means, stds, out):
+        for i in range(u.shape[0]):
+            for j in range(u.shape[1]):
+                if u[i, j] < 0.5:
+                    out[i, j] = 4.0 * z_outlier[i, j]
+                else:
+                    out[i, j] = means[j] + stds[j] * 1.5 * z_normal[i, j]
+    
+    @njit(cache=True, fastmath=True)
+    def _extreme_fraud_v(u_extreme, z_scale, u_push, z_noise, v):
+        for i in range(v.shape[0]):
+            for j in range(v.shape[1]):
+                if u_extreme[i, j] < 0.4:
+                    scaled = v[i, j] * (1 + 0.5 * z_scale[i, j])
+                    if abs(scaled) < 2:
+                        scaled *= 2 + u_push[i, j] * 2
+                    v[i, j] = scaled
+                else:
+                    v[i, j] += 0.3 * z_noise[i, j]
+else:
+    _scaled_normals = _scaled_normals_numpy
+    _synthetic_fraud_v = _synthetic_fraud_v_numpy
+    _extreme_fraud_v = _extreme_fraud_v_numpy
+
+
+def _is_fresh(derived_path: str, source_path: str) -> bool:
+    """Whether a file derived from the reference CSV exists and is not older than it"""
+    return os.path.exists(derived_path) and (
+        not os.path.exists(source_path) or os.path.getmtime(derived_path) >= os.path.getmtime(source_path)
+    )
+
+
+def ensure_parquet(csv_path: str = DATA_PATH) -> str:
+    """Convert the reference CSV to a Snappy-compressed Parquet file next to it,
+    unless an up-to-date copy already exists. Returns the Parquet path."""
+    parquet_path = os.path.splitext(csv_path)[0] + '.parquet'
+    if _is_fresh(parquet_path, csv_path):
+        return parquet_path
+    
+    from pyarrow import csv as pa_csv
+    import pyarrow.parquet as pq
+    table = pa_csv.read_csv(
+        csv_path, convert_options=pa_csv.ConvertOptions(include_columns=FEATURE_COLUMNS + ['Class'])
+    )
+    pq.write_table(table, parquet_path, compression='snappy')
+    logger.info(f"Converted {csv_path} to {parquet_path}")
+    return parquet_path
+
+
+# A generated batch in column form: features is an (n, 30) [Time, V1-V28, Amount]
+# matrix, labels and ids are parallel per-row arrays, timestamp is shared
+TransactionBatch = collections.namedtuple('TransactionBatch', 'features labels ids timestamp')
+
+
+@functools.lru_cache(maxsize=16)
+def _slot_plan(fraud_ratio: float, ambiguous_ratio: float, batch_size: int):
+    """Minimum fraud/ambiguous slots for a batch, which only depend on the ratios and batch size.
+    Returns (min_fraud, min_ambiguous, ambiguous_coin_flip)."""
+    # Ensure we always have at least 1 fraud and 1 ambiguous for variety,
+    # unless that type is disabled outright with a ratio of 0
+    min_fraud = 1 if fraud_ratio != 0.0 and batch_size >= 1 else 0
+    if ambiguous_ratio == 0.0 or batch_size <= 1:
+        return min_fraud, 0, False
+    if batch_size >= 3:
+        return min_fraud, 1, False
+    # Batch of 2: include an ambiguous transaction half of the time
+    return min_fraud, 0, True
+
+
+def _table_to_matrix(table) -> np.ndarray:
+    """Copy an Arrow table's feature columns into a row-contiguous float32 matrix"""
+    matrix = np.empty((table.num_rows, len(FEATURE_COLUMNS)), dtype=np.float32)
+    for j, name in enumerate(FEATURE_COLUMNS):
+        matrix[:, j] = table.column(name).to_numpy()
+    return matrix
+
+
+@functools.lru_cache(maxsize=1)
+def _load_creditcard(path: str):
+    """Read the reference dataset once per process and split it into
+    read-only [Time, V1-V28, Amount] fraud and legitimate matrices.
+    The matrices are cached as .npy files next to the CSV and memory-mapped
+    on later runs, so startup doesn't reparse the dataset."""
+    base_path = os.path.splitext(path)[0]
+    fraud_path = base_path + '_fraud.npy'
+    legit_path = base_path + '_legit.npy'
+    if _is_fresh(fraud_path, path) and _is_fresh(legit_path, path):
+        return np.load(fraud_path, mmap_mode='r'), np.load(legit_path, mmap_mode='r')
+    
+    fraud_matrix, legit_matrix = _read_creditcard(path)
+    try:
+        np.save(fraud_path, fraud_matrix)
+        np.save(legit_path, legit_matrix)
+    except OSError as e:
+        logger.warning(f"Could not cache reference arrays next to {path}: {e}")
+    
+    # Shared between generator instances, so guard against in-place edits
+    fraud_matrix.flags.writeable = False
+    legit_matrix.flags.writeable = False
+    return fraud_matrix, legit_matrix
+
+
+def _read_creditcard(path: str):
+    """Parse the reference dataset into row-contiguous float32 fraud and legitimate matrices"""
+    try:
+        # Columnar read with the Class filter pushed down to the Parquet reader;
+        # goes straight from Arrow to NumPy without building a DataFrame
+        import pyarrow.parquet as pq
+        parquet_path = ensure_parquet(path)
+        fraud_matrix = _table_to_matrix(
+            pq.read_table(parquet_path, columns=FEATURE_COLUMNS, filters=[('Class', '==', 1)])
+        )
+        legit_matrix = _table_to_matrix(
+            pq.read_table(parquet_path, columns=FEATURE_COLUMNS, filters=[('Class', '==', 0)])
+        )
+    except ImportError:
+        # No pyarrow installed - parse the CSV with pandas (imported lazily, only for this fallback)
+        logger.warning("Parquet support unavailable (install pyarrow), reading CSV instead")
+        import pandas as pd
+        df = pd.read_csv(path, usecols=FEATURE_COLUMNS + ['Class'])
+        # DataFrame.to_numpy returns column-major blocks; store rows contiguously
+        # so sampling by row index gathers whole 30-feature rows at once
+        fraud_matrix = np.ascontiguousarray(df.loc[df['Class'] == 1, FEATURE_COLUMNS].to_numpy(dtype=np.float32))
+        legit_matrix = np.ascontiguousarray(df.loc[df['Class'] == 0, FEATURE_COLUMNS].to_numpy(dtype=np.float32))
+    
+    return fraud_matrix, legit_matrix
+
 
 class SyntheticTransactionGenerator:
     """Generate realistic synthetic credit card transactions"""
     
-    def __init__(self, fraud_ratio: float = 0.05, ambiguous_ratio: float = 0.15):
+    def __init__(self, fraud_ratio: float = 0.05, ambiguous_ratio: float = 0.15, seed: Optional[int] = None):
         self.fraud_ratio = fraud_ratio
         self.ambiguous_ratio = ambiguous_ratio  # Transactions requiring review
+        if self.fraud_ratio + self.ambiguous_ratio >= 1.0:
+            # Adjust if ratios exceed 100%
+            self.fraud_ratio = min(self.fraud_ratio, 0.4)
+            self.ambiguous_ratio = min(self.ambiguous_ratio, 0.3)
+        
+        # Per-batch slot probabilities are the target ratios with ±20% jitter
+        self._target_ratios = np.array([self.fraud_ratio, self.ambiguous_ratio])
+        self._ratio_jitter = self._target_ratios * 0.2
         self.transaction_count = 0
         self.fraud_count = 0
         self.ambiguous_count = 0
         
+        # Per-instance PCG64 generator (faster than the legacy global np.random state)
+        self._rng = np.random.default_rng(seed)
+        
+        # Pre-drawn standard normals, rescaled per use as mu + sigma * Z
+        self._normal_buf = self._rng.standard_normal(NORMAL_BUFFER_SIZE)
+        self._normal_idx = 0
+        
         # Statistical parameters from real credit card data
         self.legitimate_params = {
             'time_mean': 94813.86,
@@ -87,347 +316,286 @@ class SyntheticTransactionGenerator:
             'v_stds': np.ones(28) * 3.5  # Larger variance for fraud
         }
         
+        # Parameters used by every batch, bound once instead of looked up per call
+        self._legit_time_mean = self.legitimate_params['time_mean']
+        self._legit_time_std = self.legitimate_params['time_std']
+        self._legit_v_means = self.legitimate_params['v_means']
+        self._legit_v_stds = self.legitimate_params['v_stds']
+        self._fraud_time_mean = self.fraud_params['time_mean']
+        self._fraud_time_std = self.fraud_params['time_std']
+        self._fraud_v_means = self.fraud_params['v_means']
+        self._fraud_v_stds = self.fraud_params['v_stds']
+        self._ambiguous_time_mean = (self._legit_time_mean + self._fraud_time_mean) / 2
+        self._ambiguous_time_std = (self._legit_time_std + self._fraud_time_std) / 2
+        
+        # Log-scale amount means, so lognormal amounts are exp(log_mean + sigma * Z)
+        self._log_legit_amount = math.log(self.legitimate_params['amount_mean'])
+        self._log_fraud_amount = math.log(self.fraud_params['amount_mean'])
+        self._log_ambiguous_amount = math.log((self.legitimate_params['amount_mean'] + self.fraud_params['amount_mean']) / 2)
+        
+        # Real transactions as [Time, V1-V28, Amount] matrices, loaded once
+        self._fraud_matrix, self._legit_matrix = self._load_reference_data()
+        
         logger.info("Synthetic Transaction Generator initialized")
         logger.info(f"Fraud ratio: {fraud_ratio * 100}%")
         logger.info(f"Ambiguous/Review ratio: {ambiguous_ratio * 100}%")
     
+    def _load_reference_data(self):
+        """Load real fraud and legitimate rows from the dataset once.
+        Returns empty matrices if the dataset is unavailable."""
+        empty = np.empty((0, len(FEATURE_COLUMNS)), dtype=np.float32)
+        try:
+            fraud_matrix, legit_matrix = _load_creditcard(DATA_PATH)
+            logger.info(f"Loaded {len(fraud_matrix)} fraud and {len(legit_matrix)} legitimate reference transactions")
+            return fraud_matrix, legit_matrix
+        except Exception as e:
+            logger.warning(f"Could not load reference data from {DATA_PATH}: {e}")
+            logger.info("Falling back to synthetic generation...")
+            return empty, empty
+    
     def generate_legitimate_transaction(self) -> Dict:
         """Generate a legitimate transaction"""
-        # Time (seconds from first transaction)
-        time_val = max(0, np.random.normal(
-            self.legitimate_params['time_mean'],
-            self.legitimate_params['time_std']
-        ))
-        
-        # Amount (typical legitimate range: $1-$500)
-        amount = max(1.0, np.random.lognormal(
-            np.log(self.legitimate_params['amount_mean']),
-            0.8
-        ))
-        amount = min(amount, 500.0)  # Cap at reasonable amount
-        
-        # V1-V28 (PCA features)
-        v_features = np.random.normal(
-            self.legitimate_params['v_means'],
-            self.legitimate_params['v_stds']
-        )
-        
-        # Ensure v_features is a numpy array before clipping
-        if not isinstance(v_features, np.ndarray):
-            v_features = np.array(v_features, dtype=float)
-        
-        # Ensure features are within reasonable bounds
-        v_features = np.clip(v_features, -5, 5).tolist()
-        
-        # Combine all features: [Time, V1-V28, Amount]
-        features = [float(time_val)] + [float(v) for v in v_features] + [float(amount)]
-        
-        return {
-            'features': features,
-            'true_label': 'Legitimate',
-            'amount': amount,
-            'time': time_val
-        }
+        return self._to_transaction(self._legitimate_batch(1)[0], 'Legitimate')
     
     def generate_fraud_transaction(self) -> Dict:
         """Generate a realistic fraudulent transaction by sampling from real frauds and adding noise."""
-        # Load real frauds from dataset
-        data_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'raw', 'creditcard.csv')
-        
-        try:
-            df = pd.read_csv(data_path)
-            fraud_df = df[df['Class'] == 1]
-            
-            if len(fraud_df) == 0:
-                # Fallback: Generate synthetic fraud if no real frauds available
-                logger.warning("No fraud data found in dataset, generating synthetic fraud...")
-                return self._generate_synthetic_fraud()
-            
-            row = fraud_df.sample(1).iloc[0]
-            
-            # Extract Time feature (first feature expected by model)
-            time_val = float(row['Time'])
-            
-            # Extract V1-V28 features and add slight noise for variety
-            v_features = [float(row[f'V{i}']) + np.random.normal(0, 0.1) for i in range(1, 29)]
-            
-            # Extract Amount and add slight noise
-            amount = float(row['Amount']) + np.random.normal(0, 2.0)
-            amount = max(1.0, min(amount, 2500.0))  # Clip to reasonable range
-            
-            # Ensure v_features is a numpy array before clipping
-            if not isinstance(v_features, np.ndarray):
-                v_features = np.array(v_features, dtype=float)
-            
-            # Clip V features to reasonable range (based on PCA feature ranges)
-            v_features = np.clip(v_features, -10, 10).tolist()
-            
-            # Combine features in correct order: [Time, V1-V28, Amount] = 30 features
-            features = [float(time_val)] + [float(v) for v in v_features] + [float(amount)]
-            
-            if len(features) != 30:
-                logger.error(f"Feature count mismatch! Expected 30, got {len(features)}")
-                return self._generate_synthetic_fraud()
-            
-            return {
-                'features': features,
-                'true_label': 'Fraudulent',
-                'amount': amount,
-                'time': time_val
-            }
-        except Exception as e:
-            logger.error(f"Error generating fraud transaction from real data: {e}")
-            logger.info("Falling back to synthetic fraud generation...")
-            return self._generate_synthetic_fraud()
+        return self._to_transaction(self._fraud_batch(1)[0], 'Fraudulent')
     
-    def _generate_synthetic_fraud(self) -> Dict:
-        """Generate synthetic fraudulent transaction with fraud-like characteristics."""
-        # Load real fraud data to get realistic patterns
-        try:
-            data_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'raw', 'creditcard.csv')
-            df = pd.read_csv(data_path)
-            fraud_df = df[df['Class'] == 1]
-            
-            if len(fraud_df) > 0:
-                # Sample a real fraud transaction as base
-                base_row = fraud_df.sample(1).iloc[0]
-                time_val = float(base_row['Time'])
-                amount = float(base_row['Amount'])
-                
-                # Modify V features to be more extreme (fraud indicators)
-                v_features = []
-                for i in range(1, 29):
-                    base_val = float(base_row[f'V{i}'])
-                    # Add more variance and make some values extreme
-                    if np.random.random() < 0.4:  # 40% chance of extreme value
-                        v_feature = base_val * (1 + np.random.normal(0, 0.5))
-                        # Make it more extreme
-                        if abs(v_feature) < 2:
-                            v_feature = v_feature * (2 + np.random.random() * 2)
-                    else:
-                        v_feature = base_val + np.random.normal(0, 0.3)
-                    
-                    v_features.append(v_feature)
-                
-                # Make amount potentially higher (fraud often involves larger amounts)
-                amount = amount * (1 + np.random.uniform(0, 0.5))
-                amount = max(1.0, min(amount, 2500.0))
-                
-            else:
-                # Fallback if no fraud data available
-                time_val = max(0, np.random.normal(self.fraud_params['time_mean'], self.fraud_params['time_std']))
-                amount = max(1.0, np.random.lognormal(np.log(self.fraud_params['amount_mean']), 1.2))
-                amount = min(amount, 2500.0)
-                
-                v_features = []
-                for i in range(28):
-                    # Generate more extreme values for fraud
-                    if np.random.random() < 0.5:  # 50% chance of outlier
-                        v_feature = np.random.normal(0, 4.0)  # Extreme value
-                    else:
-                        v_feature = np.random.normal(self.fraud_params['v_means'][i], self.fraud_params['v_stds'][i] * 1.5)
-                    v_features.append(v_feature)
+    def generate_ambiguous_transaction(self) -> Dict:
+        """Generate an ambiguous transaction that requires analyst review.
+        These have characteristics between legitimate and fraud."""
+        return self._to_transaction(self._ambiguous_batch(1)[0], 'Ambiguous')
+    
+    @staticmethod
+    def _to_transaction(features: np.ndarray, true_label: str) -> Dict:
+        """Wrap a [Time, V1-V28, Amount] feature row as a transaction dict.
+        Features stay an ndarray until they are serialized for the API."""
+        return {
+            'features': features,
+            'true_label': true_label,
+            'amount': float(features[29]),
+            'time': float(features[0])
+        }
+    
+    def _legitimate_batch(self, n: int) -> np.ndarray:
+        """Generate n legitimate transactions as an (n, 30) feature matrix"""
+        features = np.empty((n, 30))
         
-        except Exception as e:
-            logger.warning(f"Could not load fraud data for synthetic generation: {e}")
-            # Pure synthetic fallback
-            time_val = max(0, np.random.normal(self.fraud_params['time_mean'], self.fraud_params['time_std']))
-            amount = max(1.0, np.random.lognormal(np.log(self.fraud_params['amount_mean']), 1.2))
-            amount = min(amount, 2500.0)
-            
-            v_features = []
-            for i in range(28):
-                v_feature = np.random.normal(0, 4.0) if np.random.random() < 0.5 else np.random.normal(0, 3.0)
-                v_features.append(v_feature)
+        # Time (seconds from first transaction)
+        np.maximum(0, self._legit_time_mean + self._legit_time_std * self._standard_normal(n), out=features[:, 0])
         
-        # Ensure v_features is a list with exactly 28 elements
-        if not isinstance(v_features, list):
-            v_features = list(v_features)
+        # V1-V28 (PCA features), within reasonable bounds
+        _scaled_normals(
+            self._standard_normal((n, 28)),
+            self._legit_v_means,
+            self._legit_v_stds,
+            -5.0, 5.0, features[:, 1:29]
+        )
         
-        if len(v_features) != 28:
-            logger.error(f"v_features has wrong length in synthetic fraud: {len(v_features)}, expected 28")
-            v_features = [float(np.random.normal(0, 3.0)) for _ in range(28)]
+        # Amount (typical legitimate range: $1-$500)
+        amounts = features[:, 29]
+        np.exp(self._log_legit_amount + 0.8 * self._standard_normal(n), out=amounts)
+        np.clip(amounts, 1.0, 500.0, out=amounts)
         
-        # Clip to reasonable bounds (but allow more extreme values for fraud)
-        v_features = np.clip(np.array(v_features, dtype=float), -12, 12).tolist()
+        return features
+    
+    def _standard_normal(self, shape) -> np.ndarray:
+        """Take standard normal deviates from the pre-drawn buffer, refilling it when exhausted"""
+        size = int(np.prod(shape))
+        if size > len(self._normal_buf):
+            return self._rng.standard_normal(shape)
+        if self._normal_idx + size > len(self._normal_buf):
+            self._normal_buf = self._rng.standard_normal(len(self._normal_buf))
+            self._normal_idx = 0
+        z = self._normal_buf[self._normal_idx:self._normal_idx + size]
+        self._normal_idx += size
+        return z.reshape(shape)
+    
+    def _sample_rows(self, matrix: np.ndarray, n: int) -> np.ndarray:
+        """Sample n reference rows as a fresh float64 buffer that can be modified in place"""
+        return matrix[self._rng.integers(0, len(matrix), size=n)].astype(float)
+    
+    def _fraud_batch(self, n: int) -> np.ndarray:
+        """Generate n fraudulent transactions by sampling real frauds and adding noise"""
+        if len(self._fraud_matrix) == 0:
+            # Fallback: Generate synthetic fraud if no real frauds available
+            return self._synthetic_fraud_batch(n)
         
-        # Combine: [Time, V1-V28, Amount]
-        features = [float(time_val)] + [float(v) for v in v_features] + [float(amount)]
+        # Time is kept as-is (first feature expected by model)
+        features = self._sample_rows(self._fraud_matrix, n)
         
-        # Validate feature count
-        if len(features) != 30:
-            logger.error(f"Features have wrong count in synthetic fraud: {len(features)}, expected 30")
-            raise ValueError(f"Feature count mismatch: got {len(features)}, expected 30")
+        # V1-V28 with slight noise for variety, clipped to PCA feature ranges
+        v_features = features[:, 1:29]
+        v_features += 0.1 * self._standard_normal((n, 28))
+        np.clip(v_features, -10, 10, out=v_features)
         
-        logger.debug(f"Generated synthetic fraud: amount={amount:.2f}, time={time_val:.1f}, V1={v_features[0]:.3f}")
+        # Amount with slight noise, clipped to reasonable range
+        features[:, 29] += self._rng.normal(0, 2.0, size=n)
+        np.clip(features[:, 29], 1.0, 2500.0, out=features[:, 29])
         
-        return {
-            'features': features,
-            'true_label': 'Fraudulent',
-            'amount': amount,
-            'time': time_val
-        }
+        return features
     
-    def generate_ambiguous_transaction(self) -> Dict:
-        """Generate an ambiguous transaction that requires analyst review.
-        These have characteristics between legitimate and fraud."""
-        # Try to base on real data for realism
-        try:
-            data_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'raw', 'creditcard.csv')
-            df = pd.read_csv(data_path)
+    def _synthetic_fraud_batch(self, n: int) -> np.ndarray:
+        """Generate n synthetic fraudulent transactions with fraud-like characteristics."""
+        if len(self._fraud_matrix) > 0:
+            # Sample real fraud transactions as base
+            features = self._sample_rows(self._fraud_matrix, n)
             
-            # Mix legitimate and fraud to create ambiguity
-            use_fraud_base = np.random.random() < 0.5
+            # Modify V features to be more extreme (fraud indicators):
+            # 40% of values get scaled, and pushed further out if still small
+            _extreme_fraud_v(
+                self._rng.random((n, 28)),
+                self._standard_normal((n, 28)),
+                self._rng.random((n, 28)),
+                self._standard_normal((n, 28)),
+                features[:, 1:29]
+            )
             
-            if use_fraud_base:
-                fraud_df = df[df['Class'] == 1]
-                if len(fraud_df) > 0:
-                    base_row = fraud_df.sample(1).iloc[0]
-                    # Make it less extreme (move toward legitimate)
-                    time_val = float(base_row['Time']) + np.random.normal(0, 10000)
-                    amount = float(base_row['Amount']) * np.random.uniform(0.7, 1.2)
-                    
-                    # Make V features more moderate (between fraud and legitimate)
-                    v_features = []
-                    for i in range(1, 29):
-                        base_val = float(base_row[f'V{i}'])
-                        # Reduce extremes - bring closer to 0 but keep some pattern
-                        v_feature = base_val * np.random.uniform(0.5, 0.8) + np.random.normal(0, 1.0)
-                        v_features.append(v_feature)
-                    
-                    # Amount in moderate range
-                    amount = max(50.0, min(amount, 800.0))
-                else:
-                    # Fallback
-                    time_val = max(0, np.random.normal(90000, 30000))
-                    amount = np.random.uniform(100, 500)
-                    v_features = [np.random.normal(0, 2.0) for _ in range(28)]
-            else:
-                # Start with legitimate, add some suspicious elements
-                legit_df = df[df['Class'] == 0]
-                if len(legit_df) > 0:
-                    base_row = legit_df.sample(1).iloc[0]
-                    time_val = float(base_row['Time'])
-                    
-                    # Make amount slightly higher (suspicious)
-                    amount = float(base_row['Amount']) * np.random.uniform(1.5, 3.0)
-                    amount = max(100.0, min(amount, 1000.0))
-                    
-                    # Make some V features more extreme (suspicious patterns)
-                    v_features = []
-                    for i in range(1, 29):
-                        base_val = float(base_row[f'V{i}'])
-                        # Add some suspicious patterns to some features
-                        if np.random.random() < 0.3:  # 30% of features become suspicious
-                            v_feature = base_val * np.random.uniform(1.5, 2.5) + np.random.normal(0, 1.5)
-                        else:
-                            v_feature = base_val + np.random.normal(0, 0.5)
-                        v_features.append(v_feature)
-                else:
-                    # Fallback
-                    time_val = max(0, np.random.normal(90000, 30000))
-                    amount = np.random.uniform(150, 600)
-                    v_features = [np.random.normal(0, 2.5) for _ in range(28)]
-                    
-        except Exception as e:
-            logger.warning(f"Error loading data for ambiguous transaction: {e}")
-            # Pure synthetic ambiguous transaction
-            time_val = max(0, np.random.normal(
-                (self.legitimate_params['time_mean'] + self.fraud_params['time_mean']) / 2,
-                (self.legitimate_params['time_std'] + self.fraud_params['time_std']) / 2
-            ))
+            # Make amount potentially higher (fraud often involves larger amounts)
+            features[:, 29] *= 1 + self._rng.uniform(0, 0.5, size=n)
+            np.clip(features[:, 29], 1.0, 2500.0, out=features[:, 29])
+        else:
+            # Fallback if no fraud data available
+            features = np.empty((n, 30))
+            np.maximum(0, self._fraud_time_mean + self._fraud_time_std * self._standard_normal(n), out=features[:, 0])
+            np.exp(self._log_fraud_amount + 1.2 * self._standard_normal(n), out=features[:, 29])
+            np.clip(features[:, 29], 1.0, 2500.0, out=features[:, 29])
+            
+            # Generate more extreme values for fraud (50% chance of outlier)
+            _synthetic_fraud_v(
+                self._rng.random((n, 28)),
+                self._standard_normal((n, 28)),
+                self._standard_normal((n, 28)),
+                self._fraud_v_means,
+                self._fraud_v_stds,
+                features[:, 1:29]
+            )
+        
+        # Clip to reasonable bounds (but allow more extreme values for fraud)
+        np.clip(features[:, 1:29], -12, 12, out=features[:, 1:29])
+        
+        return features
+    
+    def _ambiguous_batch(self, n: int) -> np.ndarray:
+        """Generate n ambiguous transactions as an (n, 30) feature matrix"""
+        features = np.empty((n, 30))
+        
+        if len(self._fraud_matrix) == 0 and len(self._legit_matrix) == 0:
+            # Pure synthetic ambiguous transactions (no reference data loaded)
+            np.maximum(0, self._ambiguous_time_mean + self._ambiguous_time_std * self._standard_normal(n), out=features[:, 0])
             
             # Amount in moderate-high range (suspicious but not extreme)
-            amount = max(100.0, np.random.lognormal(
-                np.log((self.legitimate_params['amount_mean'] + self.fraud_params['amount_mean']) / 2),
-                0.9
-            ))
-            amount = min(amount, 800.0)
+            np.exp(self._log_ambiguous_amount + 0.9 * self._standard_normal(n), out=features[:, 29])
+            np.clip(features[:, 29], 100.0, 800.0, out=features[:, 29])
             
-            # V features: mix of moderate and slightly extreme
-            v_features = []
-            for i in range(28):
-                if np.random.random() < 0.25:  # 25% chance of suspicious feature
-                    v_feature = np.random.normal(0, 2.5)  # Slightly extreme
-                else:
-                    v_feature = np.random.normal(0, 1.8)  # Moderate
-                v_features.append(v_feature)
+            # V features: mix of moderate and slightly extreme (25% suspicious)
+            # (each value takes one branch, so a single normal draw serves both)
+            suspicious = self._rng.random((n, 28)) < 0.25
+            np.multiply(self._standard_normal((n, 28)), np.where(suspicious, 2.5, 1.8), out=features[:, 1:29])
+        else:
+            # Mix legitimate and fraud bases to create ambiguity
+            use_fraud_base = self._rng.random(n) < 0.5
+            n_fraud_base = int(use_fraud_base.sum())
+            features[use_fraud_base] = self._ambiguous_from_fraud(n_fraud_base)
+            features[~use_fraud_base] = self._ambiguous_from_legit(n - n_fraud_base)
+        
+        # Clip to reasonable bounds (wider than legitimate but narrower than fraud)
+        np.clip(features[:, 1:29], -8, 8, out=features[:, 1:29])
+        
+        return features
+    
+    def _ambiguous_from_fraud(self, n: int) -> np.ndarray:
+        """Real frauds made less extreme (moved toward legitimate)"""
+        if len(self._fraud_matrix) == 0:
+            # Fallback
+            features = np.empty((n, 30))
+            np.maximum(0, self._rng.normal(90000, 30000, size=n), out=features[:, 0])
+            features[:, 1:29] = 2.0 * self._standard_normal((n, 28))
+            features[:, 29] = self._rng.uniform(100, 500, size=n)
+            return features
         
-        # Ensure v_features is a list and has exactly 28 elements
-        if not isinstance(v_features, list):
-            v_features = list(v_features)
+        features = self._sample_rows(self._fraud_matrix, n)
+        features[:, 0] += self._rng.normal(0, 10000, size=n)
         
-        if len(v_features) != 28:
-            logger.error(f"v_features has wrong length: {len(v_features)}, expected 28")
-            # Regenerate if wrong length
-            v_features = [float(np.random.normal(0, 2.0)) for _ in range(28)]
+        # Reduce extremes - bring closer to 0 but keep some pattern
+        features[:, 1:29] *= self._rng.uniform(0.5, 0.8, size=(n, 28))
+        features[:, 1:29] += self._standard_normal((n, 28))
         
-        # Clip to reasonable bounds (wider than legitimate but narrower than fraud)
-        v_features = np.clip(np.array(v_features, dtype=float), -8, 8).tolist()
+        # Amount in moderate range
+        features[:, 29] *= self._rng.uniform(0.7, 1.2, size=n)
+        np.clip(features[:, 29], 50.0, 800.0, out=features[:, 29])
         
-        # Combine: [Time, V1-V28, Amount]
-        features = [float(time_val)] + [float(v) for v in v_features] + [float(amount)]
+        return features
+    
+    def _ambiguous_from_legit(self, n: int) -> np.ndarray:
+        """Real legitimate transactions with some suspicious elements added"""
+        if len(self._legit_matrix) == 0:
+            # Fallback
+            features = np.empty((n, 30))
+            np.maximum(0, self._rng.normal(90000, 30000, size=n), out=features[:, 0])
+            features[:, 1:29] = 2.5 * self._standard_normal((n, 28))
+            features[:, 29] = self._rng.uniform(150, 600, size=n)
+            return features
         
-        # Validate feature count
-        if len(features) != 30:
-            logger.error(f"Features have wrong count: {len(features)}, expected 30")
-            raise ValueError(f"Feature count mismatch: got {len(features)}, expected 30")
+        features = self._sample_rows(self._legit_matrix, n)
         
-        logger.debug(f"Generated ambiguous transaction: amount={amount:.2f}, time={time_val:.1f}")
+        # Make some V features more extreme (30% of features become suspicious)
+        # and the rest get small noise, updated in place on the sampled rows
+        v_features = features[:, 1:29]
+        suspicious = self._rng.random((n, 28)) < 0.3
+        v_features *= np.where(suspicious, self._rng.uniform(1.5, 2.5, size=(n, 28)), 1.0)
+        v_features += np.where(suspicious, 1.5, 0.5) * self._standard_normal((n, 28))
         
-        return {
-            'features': features,
-            'true_label': 'Ambiguous',  # Will need review
-            'amount': amount,
-            'time': time_val
-        }
+        # Make amount slightly higher (suspicious)
+        features[:, 29] *= self._rng.uniform(1.5, 3.0, size=n)
+        np.clip(features[:, 29], 100.0, 1000.0, out=features[:, 29])
+        
+        return features
     
     def generate_batch(self, batch_size: int = 10) -> List[Dict]:
         """Generate a batch of transactions including fraud, legitimate, and ambiguous (review) transactions.
         Distribution is randomized while maintaining target ratios on average."""
-        transactions = []
+        batch = self.generate_batch_arrays(batch_size)
         
+        # Convert to transaction dicts only at the API boundary, with the
+        # amount and time columns converted to Python floats in one call each
+        return [
+            {
+                'features': row,
+                'true_label': true_label,
+                'amount': amount,
+                'time': time_val,
+                'transaction_id': transaction_id,
+                'timestamp': batch.timestamp
+            }
+            for transaction_id, row, true_label, amount, time_val in zip(
+                batch.ids, batch.features, batch.labels,
+                batch.features[:, 29].tolist(), batch.features[:, 0].tolist()
+            )
+        ]
+    
+    def generate_batch_arrays(self, batch_size: int = 10) -> "TransactionBatch":
+        """Generate a batch as column arrays: an (n, 30) feature matrix plus
+        parallel label and id arrays and a shared timestamp"""
         # Randomize the distribution while maintaining target ratios
         # Use multinomial distribution to randomly assign transaction types
-        remaining_slots = batch_size
-        n_fraud = 0
-        n_ambiguous = 0
-        n_legitimate = 0
-        
-        # Ensure we always have at least 1 fraud and 1 ambiguous for variety
-        min_fraud = 1 if batch_size >= 3 else (1 if batch_size >= 1 else 0)
-        min_ambiguous = 1 if batch_size >= 3 else (0 if batch_size <= 1 else (1 if np.random.random() < 0.5 else 0))
+        min_fraud, min_ambiguous, ambiguous_coin_flip = _slot_plan(self.fraud_ratio, self.ambiguous_ratio, batch_size)
+        if ambiguous_coin_flip:
+            min_ambiguous = 1 if self._rng.random() < 0.5 else 0
         
         # Calculate remaining slots after minimums
         remaining_slots = batch_size - min_fraud - min_ambiguous
         
         if remaining_slots > 0:
-            # Randomly distribute remaining slots based on target ratios
-            # Create probability distribution (normalized so they sum to 1)
-            total_target_ratio = self.fraud_ratio + self.ambiguous_ratio
-            if total_target_ratio >= 1.0:
-                # Adjust if ratios exceed 100%
-                self.fraud_ratio = min(self.fraud_ratio, 0.4)
-                self.ambiguous_ratio = min(self.ambiguous_ratio, 0.3)
-                total_target_ratio = self.fraud_ratio + self.ambiguous_ratio
-            
-            legitimate_ratio = max(0.1, 1.0 - total_target_ratio)
-            
-            # Add some randomness to the distribution (±20% of target ratio)
-            fraud_ratio_randomized = max(0.0, self.fraud_ratio + np.random.normal(0, self.fraud_ratio * 0.2))
-            ambiguous_ratio_randomized = max(0.0, self.ambiguous_ratio + np.random.normal(0, self.ambiguous_ratio * 0.2))
-            legitimate_ratio_randomized = max(0.1, 1.0 - fraud_ratio_randomized - ambiguous_ratio_randomized)
-            
-            # Normalize
-            total_randomized = fraud_ratio_randomized + ambiguous_ratio_randomized + legitimate_ratio_randomized
-            fraud_ratio_randomized /= total_randomized
-            ambiguous_ratio_randomized /= total_randomized
-            legitimate_ratio_randomized /= total_randomized
+            # Randomly distribute remaining slots based on target ratios,
+            # with some randomness on the distribution (±20% of target ratio)
+            ratios = np.maximum(0.0, self._target_ratios + self._rng.normal(0.0, self._ratio_jitter))
+            legitimate_ratio = max(0.1, 1.0 - ratios.sum())
             
-            # Use multinomial to randomly assign remaining slots
+            # Use multinomial to randomly assign remaining slots (probabilities normalized to sum to 1)
             # This gives natural variation while maintaining average ratios
-            probabilities = [fraud_ratio_randomized, ambiguous_ratio_randomized, legitimate_ratio_randomized]
-            random_counts = np.random.multinomial(remaining_slots, probabilities)
+            probabilities = np.append(ratios, legitimate_ratio)
+            random_counts = self._rng.multinomial(remaining_slots, probabilities / probabilities.sum())
             
             n_fraud = min_fraud + int(random_counts[0])
             n_ambiguous = min_ambiguous + int(random_counts[1])
@@ -448,36 +616,39 @@ class SyntheticTransactionGenerator:
             # Add to legitimate
             n_legitimate += (batch_size - total)
         
-        # Generate fraud transactions
-        for _ in range(n_fraud):
-            transaction = self.generate_fraud_transaction()
-            self.transaction_count += 1
-            self.fraud_count += 1
-            transaction['transaction_id'] = f"SYNTH_{self.transaction_count:06d}"
-            transaction['timestamp'] = datetime.now().isoformat()
-            transactions.append(transaction)
-            logger.debug(f"Generated fraud transaction: {transaction['transaction_id']}")
-        
-        # Generate ambiguous/review transactions
-        for _ in range(n_ambiguous):
-            transaction = self.generate_ambiguous_transaction()
-            self.transaction_count += 1
-            self.ambiguous_count += 1
-            transaction['transaction_id'] = f"SYNTH_{self.transaction_count:06d}"
-            transaction['timestamp'] = datetime.now().isoformat()
-            transactions.append(transaction)
-            logger.debug(f"Generated ambiguous transaction: {transaction['transaction_id']}")
-        
-        # Generate legitimate transactions
-        for _ in range(n_legitimate):
-            transaction = self.generate_legitimate_transaction()
-            self.transaction_count += 1
-            transaction['transaction_id'] = f"SYNTH_{self.transaction_count:06d}"
-            transaction['timestamp'] = datetime.now().isoformat()
-            transactions.append(transaction)
-        
-        # Shuffle to mix transaction types
-        np.random.shuffle(transactions)
+        n_total = n_fraud + n_ambiguous + n_legitimate
+        
+        # Generate each transaction type straight into one batch matrix,
+        # skipping the generators for types that got no slots
+        features = np.empty((n_total, 30))
+        labels = np.empty(n_total, dtype=object)
+        offset = 0
+        for producer, count, true_label in (
+            (self._fraud_batch, n_fraud, 'Fraudulent'),
+            (self._ambiguous_batch, n_ambiguous, 'Ambiguous'),
+            (self._legitimate_batch, n_legitimate, 'Legitimate'),
+        ):
+            if count > 0:
+                features[offset:offset + count] = producer(count)
+                labels[offset:offset + count] = true_label
+                offset += count
+        # Producers always return (count, 30) matrices; checked only when not running under -O
+        assert offset == n_total and features.shape == (n_total, len(FEATURE_COLUMNS))
+        self.fraud_count += n_fraud
+        self.ambiguous_count += n_ambiguous
+        
+        # Shuffle rows to mix transaction types
+        order = self._rng.permutation(n_total)
+        features = features[order]
+        labels = labels[order]
+        
+        # All transactions in a batch share one timestamp
+        timestamp = datetime.now().isoformat()
+        
+        # Sequential ids for the whole batch, generated in one pass
+        start = self.transaction_count + 1
+        transaction_ids = [f"{TRANSACTION_ID_PREFIX}{i:06d}" for i in range(start, start + n_total)]
+        self.transaction_count += n_total
         
         # Calculate actual ratios for this batch
         actual_fraud_ratio = (n_fraud / batch_size * 100) if batch_size > 0 else 0
@@ -489,7 +660,7 @@ class SyntheticTransactionGenerator:
             f"{n_ambiguous} ambiguous/review ({actual_ambiguous_ratio:.1f}%), "
             f"{n_legitimate} legitimate ({actual_legitimate_ratio:.1f}%)"
         )
-        return transactions
+        return TransactionBatch(features, labels, transaction_ids, timestamp)
     
     def get_statistics(self) -> Dict:
         """Get generator statistics"""
@@ -507,28 +678,61 @@ class SyntheticTransactionGenerator:
 class TransactionSender:
     """Send transactions to the API"""
     
-    def __init__(self, api_url: str):
+    def __init__(self, api_url: str, results_stream: Optional[str] = None, max_concurrency: int = MAX_CONCURRENT_REQUESTS):
         self.api_url = api_url
+        self.max_concurrency = max_concurrency
         self.successful_predictions = 0
         self.failed_predictions = 0
+        self.correct_predictions = 0
         self.results_log = []
         
+        # Optionally append every result to an NDJSON file as it arrives and keep
+        # only a rolling window in memory, so long runs don't grow without bound
+        self.results_stream = results_stream
+        self._results_fh = None
+        self._flush_thread = None
+        self._flush_stop = threading.Event()
+        if results_stream:
+            self._results_fh = open(results_stream, 'ab', buffering=RESULTS_BUFFER_SIZE)
+            self.results_log = collections.deque(maxlen=RESULTS_WINDOW)
+            self._flush_thread = threading.Thread(target=self._periodic_flush, name='results-flush', daemon=True)
+            self._flush_thread.start()
+        self.batch_endpoint = None  # Whether the API exposes /predict_batch (detected via /health)
+        
+        # Keep-alive connection pool for the synchronous request paths
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_concurrency, pool_maxsize=max_concurrency)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        
         logger.info(f"Transaction Sender initialized for API: {api_url}")
     
     def check_api_health(self) -> bool:
         """Check if API is available"""
         try:
-            response = requests.get(f"{self.api_url}/health", timeout=5)
-            if response.status_code == 200:
-                logger.info("API health check passed")
-                return True
-            else:
-                logger.warning(f"API health check failed: status {response.status_code}")
-                return False
+            return self._handle_health_response(self.session.get(f"{self.api_url}/health", timeout=5))
+        except Exception as e:
+            logger.error(f"API health check failed: {e}")
+            return False
+    
+    async def check_api_health_async(self, client: "httpx.AsyncClient") -> bool:
+        """Check if API is available without blocking the event loop"""
+        try:
+            return self._handle_health_response(await client.get(f"{self.api_url}/health", timeout=5))
         except Exception as e:
             logger.error(f"API health check failed: {e}")
             return False
     
+    def _handle_health_response(self, response) -> bool:
+        """Record whether the API exposes /predict_batch from a /health response"""
+        if response.status_code == 200:
+            self.batch_endpoint = bool(orjson.loads(response.content).get('batch_predict', False))
+            logger.debug("API health check passed")
+            return True
+        else:
+            logger.warning(f"API health check failed: status {response.status_code}")
+            return False
+    
     def send_transaction(self, transaction: Dict) -> Dict:
         """Send a single transaction to the API"""
         try:
@@ -538,90 +742,221 @@ class TransactionSender:
             }
             
             # Send request
-            response = requests.post(
+            response = self.session.post(
                 f"{self.api_url}/predict",
-                json=payload,
+                data=orjson.dumps(payload, option=JSON_OPTIONS),
+                headers=JSON_HEADERS,
                 timeout=10
             )
             
-            if response.status_code == 200:
-                result = response.json()
-                self.successful_predictions += 1
+            return self._handle_response(transaction, response)
                 
-                # Check if prediction matches true label
-                predicted_label = result['prediction']
-                true_label = transaction['true_label']
-                probability = result['probability']
-                
-                # For ambiguous transactions, check if they're flagged for review
-                # Probability is now in percentage (0-100) from API
-                if true_label == 'Ambiguous':
-                    # Ambiguous transactions are "correct" if they get medium risk (review status)
-                    # Probability between 30% and 70% is ideal for review
-                    is_correct = 30 <= probability <= 70
-                    status_note = " (Review)" if is_correct else " (Not in review range)"
-                else:
-                    is_correct = predicted_label == true_label
-                    status_note = ""
-                
-                log_entry = {
-                    'transaction_id': transaction['transaction_id'],
-                    'timestamp': transaction['timestamp'],
-                    'true_label': true_label,
-                    'predicted_label': predicted_label,
-                    'probability': probability,
-                    'amount': transaction['amount'],
-                    'is_correct': is_correct
-                }
-                
-                self.results_log.append(log_entry)
-                
-                # Log result with special handling for ambiguous
-                if true_label == 'Ambiguous':
-                    emoji = "🔍" if is_correct else "⚠️"
-                else:
-                    emoji = "✅" if is_correct else "❌"
-                    
-                logger.info(
-                    f"{emoji} {transaction['transaction_id']} | "
-                    f"True: {true_label} | Pred: {predicted_label} | "
-                    f"Prob: {probability:.2f}%{status_note} | "
-                    f"Amount: ${transaction['amount']:.2f}"
-                )
-                
-                return log_entry
-            else:
-                self.failed_predictions += 1
-                error_detail = response.json().get('detail', 'Unknown error')
-                logger.error(f"prediction failed: {error_detail}")
-                return None
+        except Exception as e:
+            self.failed_predictions += 1
+            logger.error(f"Error sending transaction: {e}")
+            return None
+    
+    async def _send_transaction_async(self, client: "httpx.AsyncClient", transaction: Dict) -> Dict:
+        """Send a single transaction to the API over a shared async client"""
+        try:
+            response = await client.post(
+                f"{self.api_url}/predict",
+                content=orjson.dumps({"features": transaction['features']}, option=JSON_OPTIONS),
+                headers=JSON_HEADERS,
+                timeout=10
+            )
+            
+            return self._handle_response(transaction, response)
                 
         except Exception as e:
             self.failed_predictions += 1
             logger.error(f"Error sending transaction: {e}")
             return None
     
-    def send_batch(self, transactions: List[Dict]) -> List[Dict]:
-        """Send a batch of transactions"""
-        results = []
+    def _handle_response(self, transaction: Dict, response) -> Dict:
+        """Record the API's prediction for a transaction"""
+        if response.status_code == 200:
+            return self._record_result(transaction, orjson.loads(response.content))
+        else:
+            self.failed_predictions += 1
+            error_detail = orjson.loads(response.content).get('detail', 'Unknown error')
+            logger.error(f"prediction failed: {error_detail}")
+            return None
+    
+    def _record_result(self, transaction: Dict, result: Dict) -> Dict:
+        """Compare a prediction with the transaction's true label and log it"""
+        self.successful_predictions += 1
         
-        logger.info(f"Sending batch of {len(transactions)} transactions...")
+        # Check if prediction matches true label
+        predicted_label = result['prediction']
+        true_label = transaction['true_label']
+        probability = result['probability']
+        
+        # For ambiguous transactions, check if they're flagged for review
+        # Probability is now in percentage (0-100) from API
+        if true_label == 'Ambiguous':
+            # Ambiguous transactions are "correct" if they get medium risk (review status)
+            # Probability between 30% and 70% is ideal for review
+            is_correct = 30 <= probability <= 70
+            status_note = " (Review)" if is_correct else " (Not in review range)"
+        else:
+            is_correct = predicted_label == true_label
+            status_note = ""
         
-        for transaction in transactions:
-            result = self.send_transaction(transaction)
-            if result:
-                results.append(result)
-            time.sleep(0.1)  # Small delay between requests
+        log_entry = {
+            'transaction_id': transaction['transaction_id'],
+            'timestamp': transaction['timestamp'],
+            'true_label': true_label,
+            'predicted_label': predicted_label,
+            'probability': probability,
+            'amount': transaction['amount'],
+            'is_correct': is_correct
+        }
         
+        self.results_log.append(log_entry)
+        if self._results_fh is not None:
+            self._results_fh.write(orjson.dumps(log_entry) + b'\n')
+        if is_correct:
+            self.correct_predictions += 1
+        
+        # Per-transaction detail only at DEBUG; batches get an INFO summary
+        if logger.isEnabledFor(logging.DEBUG):
+            # Log result with special handling for ambiguous
+            if true_label == 'Ambiguous':
+                emoji = "🔍" if is_correct else "⚠️"
+            else:
+                emoji = "✅" if is_correct else "❌"
+            
+            logger.debug(
+                f"{emoji} {transaction['transaction_id']} | "
+                f"True: {true_label} | Pred: {predicted_label} | "
+                f"Prob: {probability:.2f}%{status_note} | "
+                f"Amount: ${transaction['amount']:.2f}"
+            )
+        
+        return log_entry
+    
+    def _log_batch_summary(self, transactions: List[Dict], results: List[Dict]) -> List[Dict]:
+        """Log one INFO line summarizing a sent batch and pass the results through"""
+        correct = sum(1 for result in results if result['is_correct'])
+        logger.info(f"Batch results: {len(results)}/{len(transactions)} predicted, {correct} correct")
         return results
     
+    def async_client(self) -> "httpx.AsyncClient":
+        """Create a keep-alive async client; reuse it across batches within one event loop"""
+        limits = httpx.Limits(max_connections=self.max_concurrency, max_keepalive_connections=self.max_concurrency)
+        return httpx.AsyncClient(limits=limits)
+    
+    async def send_batch_async(self, transactions: List[Dict], client: Optional["httpx.AsyncClient"] = None) -> List[Dict]:
+        """Send a batch of transactions concurrently, over the given client if any"""
+        if client is None:
+            async with self.async_client() as client:
+                return await self.send_batch_async(transactions, client)
+        
+        logger.info(f"Sending batch of {len(transactions)} transactions...")
+        
+        results = await asyncio.gather(
+            *[self._send_transaction_async(client, transaction) for transaction in transactions]
+        )
+        
+        return self._log_batch_summary(transactions, [result for result in results if result])
+    
+    def send_batch_single_request(self, transactions: List[Dict]) -> List[Dict]:
+        """Send a whole batch of transactions in one /predict_batch request"""
+        logger.info(f"Sending batch of {len(transactions)} transactions in a single request...")
+        
+        try:
+            response = self.session.post(
+                f"{self.api_url}/predict_batch",
+                data=self._batch_payload(transactions),
+                headers=JSON_HEADERS,
+                timeout=30
+            )
+            return self._handle_batch_response(transactions, response)
+        
+        except Exception as e:
+            self.failed_predictions += len(transactions)
+            logger.error(f"Error sending batch: {e}")
+            return []
+    
+    async def send_batch_single_request_async(self, transactions: List[Dict], client: "httpx.AsyncClient") -> List[Dict]:
+        """Send a whole batch of transactions in one /predict_batch request over the async client"""
+        logger.info(f"Sending batch of {len(transactions)} transactions in a single request...")
+        
+        try:
+            response = await client.post(
+                f"{self.api_url}/predict_batch",
+                content=self._batch_payload(transactions),
+                headers=JSON_HEADERS,
+                timeout=30
+            )
+            return self._handle_batch_response(transactions, response)
+        
+        except Exception as e:
+            self.failed_predictions += len(transactions)
+            logger.error(f"Error sending batch: {e}")
+            return []
+    
+    @staticmethod
+    def _batch_payload(transactions: List[Dict]) -> bytes:
+        """Encode a /predict_batch request body"""
+        payload = {
+            "batch": [{"features": transaction['features']} for transaction in transactions]
+        }
+        return orjson.dumps(payload, option=JSON_OPTIONS)
+    
+    def _handle_batch_response(self, transactions: List[Dict], response) -> List[Dict]:
+        """Record the API's predictions for a whole batch"""
+        if response.status_code != 200:
+            self.failed_predictions += len(transactions)
+            error_detail = orjson.loads(response.content).get('detail', 'Unknown error')
+            logger.error(f"batch prediction failed: {error_detail}")
+            return []
+        
+        predictions = orjson.loads(response.content)['predictions']
+        return self._log_batch_summary(transactions, [
+            self._record_result(transaction, result)
+            for transaction, result in zip(transactions, predictions)
+        ])
+    
+    def send_batch(self, transactions: List[Dict]) -> List[Dict]:
+        """Send a batch of transactions, using the batch endpoint when available"""
+        if self.batch_endpoint is None:
+            self.check_api_health()
+        
+        if self.batch_endpoint:
+            return self.send_batch_single_request(transactions)
+        
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(self.send_batch_async(transactions))
+        
+        # Already inside an event loop (e.g. a notebook), where asyncio.run
+        # is not allowed - fan the requests out over the pooled session instead
+        with ThreadPoolExecutor(max_workers=max(1, min(self.max_concurrency, len(transactions)))) as executor:
+            results = list(executor.map(self.send_transaction, transactions))
+        return self._log_batch_summary(transactions, [result for result in results if result])
+    
+    async def send_batch_auto_async(self, transactions: List[Dict], client: Optional["httpx.AsyncClient"] = None) -> List[Dict]:
+        """Async counterpart of send_batch for callers already inside an event loop"""
+        if client is None:
+            async with self.async_client() as client:
+                return await self.send_batch_auto_async(transactions, client)
+        
+        if self.batch_endpoint is None:
+            await self.check_api_health_async(client)
+        
+        if self.batch_endpoint:
+            return await self.send_batch_single_request_async(transactions, client)
+        return await self.send_batch_async(transactions, client)
+    
     def get_statistics(self) -> Dict:
         """Get sender statistics"""
         total_sent = self.successful_predictions + self.failed_predictions
         
-        if len(self.results_log) > 0:
-            correct_predictions = sum(1 for r in self.results_log if r['is_correct'])
-            accuracy = (correct_predictions / len(self.results_log)) * 100
+        if self.successful_predictions > 0:
+            accuracy = (self.correct_predictions / self.successful_predictions) * 100
         else:
             accuracy = 0
         
@@ -632,21 +967,51 @@ class TransactionSender:
             'accuracy': accuracy
         }
     
-    def save_results(self, filename: str = 'synthetic_results.json'):
-        """Save results to file"""
-        with open(filename, 'w') as f:
-            json.dump(self.results_log, f, indent=2)
+    def _periodic_flush(self):
+        """Flush the results stream every RESULTS_FLUSH_INTERVAL seconds until close()"""
+        while not self._flush_stop.wait(RESULTS_FLUSH_INTERVAL):
+            self._results_fh.flush()
+    
+    def save_results(self, filename: str = RESULTS_FILE):
+        """Save results to file (one JSON object per line if filename ends with .ndjson)"""
+        if self._results_fh is not None:
+            self._results_fh.flush()
+            if filename == self.results_stream:
+                # Everything has already been appended there; just make it durable
+                os.fsync(self._results_fh.fileno())
+                logger.info(f"Results saved to {filename}")
+                return
+        
+        with open(filename, 'wb') as f:
+            if filename.endswith('.ndjson'):
+                f.writelines(orjson.dumps(entry) + b'\n' for entry in self.results_log)
+            else:
+                f.write(orjson.dumps(list(self.results_log), option=orjson.OPT_INDENT_2))
         logger.info(f"Results saved to {filename}")
+    
+    def close(self):
+        """Close the results stream and pooled connections"""
+        if self._flush_thread is not None:
+            self._flush_stop.set()
+            self._flush_thread.join()
+            self._flush_thread = None
+        if self._results_fh is not None:
+            self._results_fh.close()
+            self._results_fh = None
+        self.session.close()
 
 
 class SyntheticDataPipeline:
     """Main pipeline to generate and send synthetic data"""
     
-    def __init__(self, api_url: str, interval: int = 60, batch_size: int = 10, fraud_ratio: float = 0.05, ambiguous_ratio: float = 0.15):
-        self.generator = SyntheticTransactionGenerator(fraud_ratio, ambiguous_ratio)
-        self.sender = TransactionSender(api_url)
+    def __init__(self, api_url: str, interval: int = 60, batch_size: int = 10, fraud_ratio: float = 0.05, ambiguous_ratio: float = 0.15, results_file: str = RESULTS_FILE, seed: Optional[int] = None, max_concurrency: int = MAX_CONCURRENT_REQUESTS):
+        self.generator = SyntheticTransactionGenerator(fraud_ratio, ambiguous_ratio, seed=seed)
+        # NDJSON results are streamed to disk as they arrive
+        results_stream = results_file if results_file.endswith('.ndjson') else None
+        self.sender = TransactionSender(api_url, results_stream=results_stream, max_concurrency=max_concurrency)
         self.interval = interval
         self.batch_size = batch_size
+        self.results_file = results_file
         self.is_running = False
         
         logger.info("=" * 60)
@@ -671,7 +1036,30 @@ class SyntheticDataPipeline:
         # Send to API
         results = self.sender.send_batch(transactions)
         
-        # Print statistics
+        self._log_statistics()
+        
+        return results
+    
+    async def run_once_async(self, client: Optional["httpx.AsyncClient"] = None):
+        """Run one cycle of generation and sending from inside an event loop,
+        e.g. asyncio.run(pipeline.run_once_async())"""
+        logger.info(f"\n{'='*60}")
+        logger.info(f"Starting generation cycle at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+        logger.info(f"{'='*60}")
+        
+        # Generate transactions
+        transactions = self.generator.generate_batch(self.batch_size)
+        logger.info(f"Generated {len(transactions)} transactions")
+        
+        # Send to API without blocking the event loop
+        results = await self.sender.send_batch_auto_async(transactions, client)
+        
+        self._log_statistics()
+        
+        return results
+    
+    def _log_statistics(self):
+        """Log running generation and prediction statistics"""
         gen_stats = self.generator.get_statistics()
         send_stats = self.sender.get_statistics()
         
@@ -686,34 +1074,18 @@ class SyntheticDataPipeline:
         logger.info(f"   Successful: {send_stats['successful']}")
         logger.info(f"   Failed: {send_stats['failed']}")
         logger.info(f"   Accuracy: {send_stats['accuracy']:.2f}%")
-        
-        return results
     
     def run_continuous(self):
         """Run continuously with specified interval"""
         self.is_running = True
         
-        # Check API health first
-        if not self.sender.check_api_health():
-            logger.error("API is not available. Please start the API first.")
-            return
-        
+        # Cycles wait for the API instead of exiting while it is down
         logger.info("Starting continuous generation...")
         logger.info(f"Will generate every {self.interval} seconds")
         logger.info("Press Ctrl+C to stop\n")
         
-        cycle_count = 0
-        
         try:
-            while self.is_running:
-                cycle_count += 1
-                logger.info(f"\nCycle #{cycle_count}")
-            
-                self.run_once()
-                
-                # Wait for next cycle
-                logger.info(f"\n Waiting {self.interval} seconds until next cycle...")
-                time.sleep(self.interval)
+            asyncio.run(self._run_continuous_async())
                 
         except KeyboardInterrupt:
             logger.info("\n\nStopping synthetic data generation...")
@@ -722,12 +1094,89 @@ class SyntheticDataPipeline:
             logger.error(f" Error in continuous run: {e}")
             self.stop()
     
+    async def _produce_batches(self, queue: asyncio.Queue):
+        """Generate batches ahead of time so generation overlaps with sending"""
+        while self.is_running:
+            # Generate off the event loop thread so in-flight requests keep progressing
+            await queue.put(await asyncio.to_thread(self.generator.generate_batch, self.batch_size))
+    
+    async def _next_batch(self, queue: asyncio.Queue, producer: asyncio.Task) -> Optional[List[Dict]]:
+        """Take the next batch, re-raising the producer's error instead of waiting forever;
+        None once the producer has stopped"""
+        get_task = asyncio.ensure_future(queue.get())
+        try:
+            await asyncio.wait({get_task, producer}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            if not get_task.done():
+                get_task.cancel()
+        if get_task.done() and not get_task.cancelled():
+            return get_task.result()
+        producer.result()
+        return None
+    
+    async def _watch_api_health(self, client: "httpx.AsyncClient", api_up: asyncio.Event):
+        """Keep api_up in sync with the API's /health, backing off while it is down"""
+        retry = HEALTH_RETRY_MIN
+        while self.is_running:
+            if await self.sender.check_api_health_async(client):
+                if not api_up.is_set():
+                    logger.info("API is available")
+                    api_up.set()
+                retry = HEALTH_RETRY_MIN
+                await asyncio.sleep(HEALTH_POLL_INTERVAL)
+            else:
+                if api_up.is_set():
+                    logger.warning("API became unavailable; pausing generation")
+                    api_up.clear()
+                await asyncio.sleep(retry)
+                retry = min(retry * 2, HEALTH_RETRY_MAX)
+    
+    async def _run_continuous_async(self):
+        """Send generated batches every interval while the next one is produced"""
+        # Keep at most one batch waiting so timestamps don't go stale
+        queue = asyncio.Queue(maxsize=1)
+        producer = asyncio.create_task(self._produce_batches(queue))
+        # One async client for the whole run keeps connections alive between cycles
+        client = self.sender.async_client()
+        api_up = asyncio.Event()
+        health_watcher = asyncio.create_task(self._watch_api_health(client, api_up))
+        cycle_count = 0
+        
+        try:
+            while self.is_running:
+                if not api_up.is_set():
+                    logger.info("Waiting for the API to become available...")
+                    await api_up.wait()
+                
+                cycle_start = time.monotonic()
+                cycle_count += 1
+                logger.info(f"\nCycle #{cycle_count}")
+                logger.info(f"Starting generation cycle at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+                
+                transactions = await self._next_batch(queue, producer)
+                if transactions is None:
+                    break
+                logger.info(f"Generated {len(transactions)} transactions")
+                
+                await self.sender.send_batch_auto_async(transactions, client)
+                self._log_statistics()
+                
+                # Wait for next cycle, discounting the time spent in this one
+                wait = max(0.0, self.interval - (time.monotonic() - cycle_start))
+                logger.info(f"\n Waiting {wait:.1f} seconds until next cycle...")
+                await asyncio.sleep(wait)
+        finally:
+            producer.cancel()
+            health_watcher.cancel()
+            await client.aclose()
+    
     def stop(self):
         """Stop the pipeline and save results"""
         self.is_running = False
         
         # Save results
-        self.sender.save_results()
+        self.sender.save_results(self.results_file)
+        self.sender.close()
         
         # Final statistics
         gen_stats = self.generator.get_statistics()
@@ -759,8 +1208,11 @@ def main():
     parser.add_argument('--api-url', default='http://localhost:8000', help='FastAPI URL')
     parser.add_argument('--interval', type=int, default=60, help='Generation interval in seconds')
     parser.add_argument('--batch-size', type=int, default=10, help='Transactions per batch')
-    parser.add_argument('--fraud-ratio', type=float, default=0.05, help='Fraud ratio (0.0-1.0)')
+    parser.add_argument('--fraud-ratio', type=float, default=FRAUD_RATIO, help='Fraud ratio (0.0-1.0)')
     parser.add_argument('--ambiguous-ratio', type=float, default=0.15, help='Ambiguous/Review ratio (0.0-1.0)')
+    parser.add_argument('--max-concurrency', type=int, default=MAX_CONCURRENT_REQUESTS, help='Maximum in-flight prediction requests')
+    parser.add_argument('--seed', type=int, default=None, help='Random seed for reproducible batches')
+    parser.add_argument('--results-file', default=RESULTS_FILE, help='Results output file: .ndjson appends one object per line as results arrive; .json writes a single array at exit (the previous default format)')
     parser.add_argument('--once', action='store_true', help='Run once and exit')
     
     args = parser.parse_args()
@@ -771,7 +1223,10 @@ def main():
         interval=args.interval,
         batch_size=args.batch_size,
         fraud_ratio=args.fraud_ratio,
-        ambiguous_ratio=args.ambiguous_ratio
+        ambiguous_ratio=args.ambiguous_ratio,
+        results_file=args.results_file,
+        seed=args.seed,
+        max_concurrency=args.max_concurrency
     )
     
     if args.once:
@@ -0,0 +1,54 @@
+"""
+Export the scikit-learn ensemble members (RF, LR) to ONNX so the API can serve them
+through ONNX Runtime. Re-run after retraining; the API ignores ONNX files that are
+older than their pickles.
+
+    python -m app.export_onnx
+"""
+
+import os
+import joblib
+from skl2onnx import convert_sklearn
+from skl2onnx.common.data_types import FloatTensorType
+
+BASE_DIR = os.path.dirname(os.path.dirname(__file__))  # project root
+MODELS_DIR = os.path.join(BASE_DIR, "models")
+
+ONNX_MODELS = ("rf_model", "lr_model")
+ONNX_INPUT_NAME = "X"  # must match ONNX_INPUT_NAME in app/main.py
+
+
+def export_model(name: str, n_features: int, models_dir: str = MODELS_DIR) -> str:
+    """Convert models/<name>.pkl to models/<name>.onnx with a float32 [None, n_features] input"""
+    model = joblib.load(os.path.join(models_dir, f"{name}.pkl"))
+    onnx_model = convert_sklearn(
+        model,
+        initial_types=[(ONNX_INPUT_NAME, FloatTensorType([None, n_features]))],
+        # Plain (n, 2) probability tensor instead of a list of {class: prob} dicts
+        options={id(model): {"zipmap": False}},
+    )
+
+    onnx_path = os.path.join(models_dir, f"{name}.onnx")
+    with open(onnx_path, "wb") as f:
+        f.write(onnx_model.SerializeToString())
+    return onnx_path
+
+
+def main():
+    """Main entry point"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Export FraudDetectPro RF/LR models to ONNX')
+    parser.add_argument('--models-dir', default=MODELS_DIR, help='Directory holding the model pickles')
+    args = parser.parse_args()
+
+    metadata = joblib.load(os.path.join(args.models_dir, "model_metadata.pkl"))
+    n_features = int(metadata.get("hybrid_features", metadata.get("input_features", 30)))
+
+    for name in ONNX_MODELS:
+        onnx_path = export_model(name, n_features, args.models_dir)
+        print(f"✅ Exported {name} -> {onnx_path}")
+
+
+if __name__ == "__main__":
+    main()
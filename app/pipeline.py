@@ -6,9 +6,17 @@ from sklearn.cluster import KMeans
 from imblearn.over_sampling import SMOTE
 from sklearn.ensemble import IsolationForest, RandomForestClassifier
 from sklearn.linear_model import LogisticRegression
+from scipy.special import expit
 import xgboost as xgb
 import lightgbm as lgb
 
+# Numba JIT kernel for the engineered features (NumPy fallback below)
+try:
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
 class ImprovedConservativeSampler:
     def __init__(self, target_fraud_ratio=0.3, random_state=42):
         self.target_fraud_ratio = target_fraud_ratio
@@ -35,6 +43,68 @@ class ImprovedConservativeSampler:
         print(f"After sampling  - Fraud: {np.sum(y_after == 1)}, Legitimate: {np.sum(y_after == 0)}, Ratio: {after_fraud_ratio:.4f}")
         print(f"Sampling multiplier: {after_fraud_ratio/before_fraud_ratio:.1f}x")
 
+V_COLUMNS = [f'V{i}' for i in range(1, 29)]
+DERIVED_COLUMNS = [
+    'Amount_Log', 'V1_V2_Interaction', 'V3_V4_Interaction', 'V12_V14_Interaction',
+    'V1_V4_Ratio', 'V2_V5_Ratio', 'V_Abs_Mean', 'V_Std'
+]
+CLUSTERING_FEATURES = ['V1', 'V2', 'V3', 'V4', 'V5', 'Amount_Log']
+
+def _derived_features_numpy(V, amount, out):
+    """Fill out (n, 8) with DERIVED_COLUMNS column by column"""
+    np.log1p(amount, out=out[:, 0])
+    np.multiply(V[:, 0], V[:, 1], out=out[:, 1])
+    np.multiply(V[:, 2], V[:, 3], out=out[:, 2])
+    np.multiply(V[:, 11], V[:, 13], out=out[:, 3])
+    np.divide(V[:, 0], V[:, 3] + 1e-8, out=out[:, 4])
+    np.divide(V[:, 1], V[:, 4] + 1e-8, out=out[:, 5])
+    # One (n, 28) scratch block serves both |V| and the squared deviations
+    scratch = np.abs(V)
+    scratch.mean(axis=1, out=out[:, 6])
+    np.subtract(V, V.mean(axis=1, keepdims=True), out=scratch)
+    np.square(scratch, out=scratch)
+    scratch.sum(axis=1, out=out[:, 7])
+    out[:, 7] /= V.shape[1] - 1  # ddof=1 matches DataFrame.std
+    np.sqrt(out[:, 7], out=out[:, 7])
+
+if NUMBA_AVAILABLE:
+    @njit(parallel=True, fastmath=True, cache=True)
+    def _derived_features(V, amount, out):
+        # One row at a time, so all eight features share a single read of V[i, :]
+        n_v = V.shape[1]
+        for i in prange(V.shape[0]):
+            row = V[i]
+            out[i, 0] = np.log1p(amount[i])
+            out[i, 1] = row[0] * row[1]
+            out[i, 2] = row[2] * row[3]
+            out[i, 3] = row[11] * row[13]
+            out[i, 4] = row[0] / (row[3] + 1e-8)
+            out[i, 5] = row[1] / (row[4] + 1e-8)
+            total = 0.0
+            abs_total = 0.0
+            for j in range(n_v):
+                total += row[j]
+                abs_total += abs(row[j])
+            mean = total / n_v
+            sq_dev = 0.0
+            for j in range(n_v):
+                sq_dev += (row[j] - mean) ** 2
+            out[i, 6] = abs_total / n_v
+            out[i, 7] = np.sqrt(sq_dev / (n_v - 1))  # ddof=1 matches DataFrame.std
+else:
+    _derived_features = _derived_features_numpy
+
+def derived_features(V, amount):
+    """DERIVED_COLUMNS for an (n, 28) V1..V28 matrix and the Amount column,
+    filled into one preallocated (n, 8) array instead of one Series per feature"""
+    out = np.empty((V.shape[0], len(DERIVED_COLUMNS)))
+    if NUMBA_AVAILABLE:
+        # The kernel walks rows, so give it C-ordered input
+        V = np.ascontiguousarray(V)
+        amount = np.ascontiguousarray(amount)
+    _derived_features(V, amount, out)
+    return out
+
 class SafeCreditCardFeatureEngineer:
     def __init__(self, n_clusters=3):
         self.n_clusters = n_clusters
@@ -44,46 +114,39 @@ class SafeCreditCardFeatureEngineer:
         self.feature_names = []
         self.expected_feature_count = None
     
+    def _build_features(self, X):
+        """Raw and derived columns written into one preallocated (n, len(feature_names))
+        float64 array in feature_names order, plus the NaN-free KMeans input taken from it.
+        The behavior_cluster column is left for the caller; X itself is never copied."""
+        position = {name: i for i, name in enumerate(self.feature_names)}
+        raw_columns = [name for name in self.feature_names if name not in DERIVED_COLUMNS and name != 'behavior_cluster']
+        out = np.empty((len(X), len(self.feature_names)))
+        out[:, [position[name] for name in raw_columns]] = X[raw_columns].to_numpy(dtype=np.float64)
+        out[:, [position[name] for name in DERIVED_COLUMNS]] = derived_features(
+            X[V_COLUMNS].to_numpy(dtype=np.float64), X['Amount'].to_numpy(dtype=np.float64)
+        )
+        cluster_data = out[:, [position[name] for name in CLUSTERING_FEATURES]]  # fancy indexing copies
+        cluster_data[np.isnan(cluster_data)] = 0.0
+        return out, cluster_data, position['behavior_cluster']
+    
     def fit_transform(self, X, y=None):
-        df = X.copy()
-        df['Amount_Log'] = np.log1p(df['Amount'])
-        df['V1_V2_Interaction'] = df['V1'] * df['V2']
-        df['V3_V4_Interaction'] = df['V3'] * df['V4']
-        df['V12_V14_Interaction'] = df['V12'] * df['V14']
-        df['V1_V4_Ratio'] = df['V1'] / (df['V4'] + 1e-8)
-        df['V2_V5_Ratio'] = df['V2'] / (df['V5'] + 1e-8)
-        v_columns = [f'V{i}' for i in range(1, 29)]
-        df['V_Abs_Mean'] = np.abs(df[v_columns]).mean(axis=1)
-        df['V_Std'] = df[v_columns].std(axis=1)
-        clustering_features = ['V1', 'V2', 'V3', 'V4', 'V5', 'Amount_Log']
-        cluster_data = df[clustering_features].fillna(0)
+        self.feature_names = [col for col in X.columns if col not in ['Time', 'Class']] + DERIVED_COLUMNS + ['behavior_cluster']
+        self.expected_feature_count = len(self.feature_names)
+        out, cluster_data, cluster_col = self._build_features(X)
         self.kmeans.fit(cluster_data)
         self.is_fitted = True
-        df['behavior_cluster'] = self.kmeans.predict(cluster_data)
-        self.feature_names = [col for col in df.columns if col not in ['Time', 'Class']]
-        self.expected_feature_count = len(self.feature_names)
-        return df[self.feature_names]
+        out[:, cluster_col] = self.kmeans.predict(cluster_data)
+        return pd.DataFrame(out, columns=self.feature_names, index=X.index)
     
     def transform(self, X):
+        """Engineered features as an (n, len(feature_names)) float64 array, in feature_names order"""
         if not self.is_fitted:
             raise ValueError("Must fit transformer before transforming data")
-        df = X.copy()
-        df['Amount_Log'] = np.log1p(df['Amount'])
-        df['V1_V2_Interaction'] = df['V1'] * df['V2']
-        df['V3_V4_Interaction'] = df['V3'] * df['V4']
-        df['V12_V14_Interaction'] = df['V12'] * df['V14']
-        df['V1_V4_Ratio'] = df['V1'] / (df['V4'] + 1e-8)
-        df['V2_V5_Ratio'] = df['V2'] / (df['V5'] + 1e-8)
-        v_columns = [f'V{i}' for i in range(1, 29)]
-        df['V_Abs_Mean'] = np.abs(df[v_columns]).mean(axis=1)
-        df['V_Std'] = df[v_columns].std(axis=1)
-        clustering_features = ['V1', 'V2', 'V3', 'V4', 'V5', 'Amount_Log']
-        cluster_data = df[clustering_features].fillna(0)
-        df['behavior_cluster'] = self.kmeans.predict(cluster_data)
-        result_df = df[self.feature_names]
-        if result_df.shape[1] != self.expected_feature_count:
-            raise ValueError(f"Feature count mismatch! Expected {self.expected_feature_count}, got {result_df.shape[1]}")
-        return result_df
+        if len(self.feature_names) != self.expected_feature_count:
+            raise ValueError(f"Feature count mismatch! Expected {self.expected_feature_count}, got {len(self.feature_names)}")
+        out, cluster_data, cluster_col = self._build_features(X)
+        out[:, cluster_col] = self.kmeans.predict(cluster_data)
+        return out
 
 class ImprovedCreditCardEnsemble:
     def __init__(self, random_state=42):
@@ -116,16 +179,40 @@ class ImprovedCreditCardEnsemble:
             random_state=self.random_state, class_weight='balanced', 
             C=0.01, max_iter=2000, penalty='l1', solver='liblinear'
         )    
-    def fit(self, X, y):
+    def fit(self, X, y, return_oof=False, n_folds=5):
+        """Fit every base model on (X, y). With return_oof, also returns (and keeps in
+        oof_preds_) out-of-fold probabilities shaped like predict_proba's output, so the
+        meta-learner trains on predictions for rows the supervised models did not see."""
         if isinstance(X, np.ndarray):
             X = X.astype(float)
         else:
             X = np.asarray(X, dtype=float)
+        y = np.asarray(y)
         self.initialize_models(X.shape[1])
+        oof_preds = {}
+        if return_oof:
+            from sklearn.base import clone
+            from sklearn.model_selection import StratifiedKFold, cross_val_predict
+            cv = StratifiedKFold(n_splits=n_folds, shuffle=True, random_state=self.random_state)
         for name in ['xgb', 'lgb', 'random_forest', 'logistic']:
+            if return_oof:
+                oof_preds[name] = cross_val_predict(
+                    clone(self.models[name]), X, y, cv=cv, method='predict_proba'
+                )[:, 1]
             self.models[name].fit(X, y)
         self.models['isolation_forest'].fit(X)
         self.is_trained = True
+        if return_oof:
+            # IsolationForest never sees the labels, so its in-sample scores do not leak
+            oof_preds['isolation_forest'] = self._isolation_proba(X)
+            self.oof_preds_ = oof_preds
+            return oof_preds
+    
+    def _isolation_proba(self, X):
+        # sigmoid(2 * score), in place on the fresh decision_function array
+        iso_scores = self.models['isolation_forest'].decision_function(X)
+        iso_scores *= 2.0
+        return expit(iso_scores, out=iso_scores)
     
     def predict_proba(self, X):
         if not self.is_trained:
@@ -135,10 +222,12 @@ class ImprovedCreditCardEnsemble:
         else:
             X = np.asarray(X, dtype=float)
         predictions = {}
-        for name in ['xgb', 'lgb', 'random_forest', 'logistic']:
+        # The booster's inplace_predict skips the sklearn wrapper's per-call DMatrix; with the
+        # default binary:logistic objective its output is already the fraud probability
+        predictions['xgb'] = self.models['xgb'].get_booster().inplace_predict(X)
+        for name in ['lgb', 'random_forest', 'logistic']:
             predictions[name] = self.models[name].predict_proba(X)[:, 1]
-        iso_scores = self.models['isolation_forest'].decision_function(X)
-        predictions['isolation_forest'] = 1 / (1 + np.exp(-iso_scores * 2))
+        predictions['isolation_forest'] = self._isolation_proba(X)
         return predictions
 
 class SimplifiedMetaLearner:
@@ -147,21 +236,30 @@ class SimplifiedMetaLearner:
         self.meta_model = None
         self.scaler = RobustScaler()
     
+    def _combine(self, base_predictions, features):
+        # Base predictions (in base_model_names order) then the features, filled into one buffer
+        features = np.asarray(features)
+        n_base = len(self.base_model_names)
+        combined = np.empty((features.shape[0], n_base + features.shape[1]))
+        for i, name in enumerate(self.base_model_names):
+            combined[:, i] = base_predictions[name]
+        combined[:, n_base:] = features
+        return combined
+    
     def fit(self, base_predictions, features, y):
-        base_pred_matrix = np.column_stack([base_predictions[name] for name in base_predictions])
-        combined_features = np.column_stack([base_pred_matrix, features])
-        combined_features_scaled = self.scaler.fit_transform(combined_features)
+        self.base_model_names = list(base_predictions.keys())
+        combined_features_scaled = self.scaler.fit_transform(self._combine(base_predictions, features))
         self.meta_model = LogisticRegression(
             random_state=self.random_state, class_weight='balanced', C=0.1, max_iter=1000
         )
         self.meta_model.fit(combined_features_scaled, y)
-        self.base_model_names = list(base_predictions.keys())
     
     def predict(self, base_predictions, features):
-        base_pred_matrix = np.column_stack([base_predictions[name] for name in base_predictions])
-        combined_features = np.column_stack([base_pred_matrix, features])
-        combined_features_scaled = self.scaler.transform(combined_features)
-        predictions = self.meta_model.predict_proba(combined_features_scaled)[:, 1]
+        # RobustScaler.transform applied in place on the freshly built buffer
+        combined_features = self._combine(base_predictions, features)
+        combined_features -= self.scaler.center_
+        combined_features /= self.scaler.scale_
+        predictions = self.meta_model.predict_proba(combined_features)[:, 1]
         n_base_models = len(self.base_model_names)
         attention_weights = np.ones((len(predictions), n_base_models)) / n_base_models
         return predictions.reshape(-1, 1), attention_weights
@@ -190,6 +288,9 @@ class SaveableCreditCardExplainer:
             self.shap_background = None
 
     def _get_lime_explainer(self):
+        # Built on first use and reused; its training statistics depend only on the background
+        if getattr(self, '_lime_explainer', None) is not None:
+            return self._lime_explainer
         from lime.lime_tabular import LimeTabularExplainer
         # Use background data from SHAP if available, else random
         if hasattr(self, 'shap_background') and self.shap_background is not None:
@@ -204,9 +305,12 @@ class SaveableCreditCardExplainer:
             discretize_continuous=True,
             mode='classification'
         )
+        self._lime_explainer = explainer
         return explainer
 
-    def explain(self, transaction, prediction, base_predictions):
+    def explain(self, transaction, prediction, base_predictions, compute_lime=False):
+        """TreeSHAP attributions for one transaction. LIME fits a local surrogate over
+        thousands of perturbed model calls, so it only runs when compute_lime is set."""
         import numpy as np
         explanation = {}
         # SHAP values
@@ -217,6 +321,8 @@ class SaveableCreditCardExplainer:
                 shap_values = shap_values[1]
             feature_importance = dict(zip(self.feature_names, shap_values[0]))
             explanation['shap'] = feature_importance
+        if not compute_lime:
+            return explanation
         # LIME explanation
         try:
             lime_explainer = self._get_lime_explainer()
@@ -271,11 +377,11 @@ class ImprovedCreditCardFraudPipeline:
             raise ValueError(f"Feature dimension mismatch! Train: {X_train_engineered.shape[1]}, Test: {X_test_engineered.shape[1]}")
         X_resampled, y_resampled = self.sampler.fit_resample(X_train_engineered, y_train)
         self.sampler.get_sampling_info(y_train, y_resampled)
-        self.base_ensemble.fit(X_resampled, y_resampled)
-        base_predictions = self.base_ensemble.predict_proba(X_resampled)
+        base_predictions = self.base_ensemble.fit(X_resampled, y_resampled, return_oof=True)
         self.meta_learner = SimplifiedMetaLearner(random_state=42)
         self.meta_learner.fit(base_predictions, X_resampled.values, y_resampled)
-        self.explainer = SaveableCreditCardExplainer(self.base_ensemble, self.feature_names)
+        background = X_train_engineered.sample(n=min(100, len(X_train_engineered)), random_state=42).to_numpy()
+        self.explainer = self._build_explainer(background)
         self.is_trained = True
         test_predictions, _ = self.predict_batch(X_test_engineered)
         self.optimal_threshold = self.find_optimal_threshold(y_test, test_predictions)
@@ -283,21 +389,33 @@ class ImprovedCreditCardFraudPipeline:
         self.performance_metrics = performance
         return X_test_engineered, y_test, performance
     
-    def find_optimal_threshold(self, y_true, y_scores):
-        from sklearn.metrics import f1_score
-        thresholds = np.arange(0.05, 0.5, 0.02)
-        best_threshold = 0.3
-        best_f1 = 0
-        for threshold in thresholds:
-            y_pred = (y_scores > threshold).astype(int)
-            if len(np.unique(y_pred)) > 1:
-                f1 = f1_score(y_true, y_pred)
-                if f1 > best_f1:
-                    best_f1 = f1
-                    best_threshold = threshold
-        return best_threshold
+    def find_optimal_threshold(self, y_true, y_scores, min_threshold=0.05, max_threshold=0.5):
+        """F1-optimal threshold in [min_threshold, max_threshold) for `y_scores > threshold`.
+        One sort plus cumulative TP/FP counts score every distinct cut point at once."""
+        y_true = np.asarray(y_true).ravel()
+        y_scores = np.asarray(y_scores, dtype=float).ravel()
+        order = np.argsort(-y_scores, kind='mergesort')
+        scores = y_scores[order]
+        tp = np.cumsum(y_true[order])
+        fp = np.arange(1, len(scores) + 1) - tp
+        # Cut between each pair of distinct neighbouring scores, so both classes are predicted;
+        # any threshold in [scores[k + 1], scores[k]) gives cut k, clipped to the search window
+        cuts = np.flatnonzero(scores[:-1] != scores[1:])
+        low = np.maximum(scores[cuts + 1], min_threshold)
+        high = np.minimum(scores[cuts], max_threshold)
+        in_range = low < high
+        if tp.size == 0 or tp[-1] == 0 or not in_range.any():
+            return 0.3
+        cuts = cuts[in_range]
+        thresholds = (low[in_range] + high[in_range]) / 2
+        fn = tp[-1] - tp[cuts]
+        f1 = 2 * tp[cuts] / (2 * tp[cuts] + fp[cuts] + fn)
+        best = np.argmax(f1)
+        if f1[best] <= 0:
+            return 0.3
+        return float(thresholds[best])
     
-    def predict(self, transaction_data, threshold=None):
+    def predict(self, transaction_data, threshold=None, compute_lime=False):
         if not self.is_trained:
             raise ValueError("Pipeline must be trained first!")
         if threshold is None:
@@ -313,7 +431,8 @@ class ImprovedCreditCardFraudPipeline:
         fraud_prediction = final_prediction[0][0] > threshold
         explanation = self.explainer.explain(
             transaction_array[0], final_prediction[0][0], 
-            {k: v[0] for k, v in base_predictions.items()}
+            {k: v[0] for k, v in base_predictions.items()},
+            compute_lime=compute_lime
         )
         explanation['attention_weights'] = {
             list(base_predictions.keys())[i]: float(weight) 
@@ -383,5 +502,14 @@ class ImprovedCreditCardFraudPipeline:
         for key, value in loaded_pipeline.__dict__.items():
             if key != 'explainer':
                 setattr(self, key, value)
-        self.explainer = SaveableCreditCardExplainer(self.base_ensemble, self.feature_names)
-        return self
\ No newline at end of file
+        self.explainer = self._build_explainer()
+        return self
+    
+    def _build_explainer(self, X_background=None):
+        explainer = SaveableCreditCardExplainer(self.base_ensemble, self.feature_names)
+        # TreeExplainer is built once here, not per explanation; without shap only LIME is available
+        try:
+            explainer.fit_shap(X_background)
+        except Exception as e:
+            print(f"SHAP explainer unavailable: {e}")
+        return explainer
\ No newline at end of file
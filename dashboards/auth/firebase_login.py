@@ -6,13 +6,29 @@ Handles user authentication with Firebase (Gmail, GitHub, Phone)
 import streamlit as st
 import firebase_admin
 from firebase_admin import credentials, auth
-import requests
+import httpx
 import json
 from datetime import datetime, timedelta
 import os
+import atexit
+import hashlib
+import threading
+import time
+from cachetools import TTLCache
 from dotenv import load_dotenv
 load_dotenv()
 
+# One pooled client for the Firebase REST calls: kept-alive connections skip the TCP +
+# TLS handshake on every sign-in and refresh. Streamlit calls these synchronously.
+http_client = httpx.Client(timeout=5.0, limits=httpx.Limits(max_keepalive_connections=20))
+atexit.register(http_client.close)
+
+# verify_token results per token (blake2b digest); an entry is never used past the
+# token's own "exp" claim. Streamlit runs sessions on separate threads, hence the lock.
+TOKEN_CACHE_TTL_SECONDS = 300
+token_cache = TTLCache(maxsize=10_000, ttl=TOKEN_CACHE_TTL_SECONDS)
+token_cache_lock = threading.Lock()
+
 class FirebaseAuth:
     def __init__(self):
         """Initialize Firebase Admin SDK"""
@@ -34,7 +50,7 @@ class FirebaseAuth:
                 "password": password,
                 "returnSecureToken": True
             }
-            response = requests.post(url, json=payload)
+            response = http_client.post(url, json=payload)
             
             if response.status_code == 200:
                 user_data = response.json()
@@ -60,7 +76,7 @@ class FirebaseAuth:
                 "password": password,
                 "returnSecureToken": True
             }
-            response = requests.post(url, json=payload)
+            response = http_client.post(url, json=payload)
             
             if response.status_code == 200:
                 user_data = response.json()
@@ -78,9 +94,18 @@ class FirebaseAuth:
     
     def verify_token(self, id_token: str):
         """Verify Firebase ID token"""
+        key = hashlib.blake2b(id_token.encode(), digest_size=16).digest()
+        with token_cache_lock:
+            cached = token_cache.get(key)
+        if cached is not None and cached[0] > time.time():
+            return cached[1]
+        
         try:
             decoded_token = auth.verify_id_token(id_token)
-            return {'success': True, 'uid': decoded_token['uid'], 'email': decoded_token.get('email')}
+            result = {'success': True, 'uid': decoded_token['uid'], 'email': decoded_token.get('email')}
+            with token_cache_lock:
+                token_cache[key] = (decoded_token.get('exp', 0), result)
+            return result
         except Exception as e:
             return {'success': False, 'error': str(e)}
     
@@ -92,7 +117,7 @@ class FirebaseAuth:
                 "grant_type": "refresh_token",
                 "refresh_token": refresh_token
             }
-            response = requests.post(url, json=payload)
+            response = http_client.post(url, json=payload)
             
             if response.status_code == 200:
                 data = response.json()
@@ -116,6 +141,12 @@ class FirebaseAuth:
         st.rerun()
 
 
+@st.cache_resource
+def get_auth_handler() -> FirebaseAuth:
+    """Shared FirebaseAuth instance, so reruns skip re-reading firebase.json and the env"""
+    return FirebaseAuth()
+
+
 def init_session_state():
     """Initialize session state variables"""
     if 'user' not in st.session_state:
@@ -130,7 +161,7 @@ def login_page():
     """Render login page"""
     st.title("🔐 FraudDetectPro Login")
     
-    auth_handler = FirebaseAuth()
+    auth_handler = get_auth_handler()
     
     tab1, tab2 = st.tabs(["Sign In", "Sign Up"])
     
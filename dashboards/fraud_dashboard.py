@@ -10,13 +10,16 @@ import requests
 import plotly.graph_objects as go
 import plotly.express as px
 from datetime import datetime
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
 import sys
 import os
 
 # Add auth module to path
 sys.path.append(os.path.dirname(__file__))
 from auth.firebase_login import (
-    FirebaseAuth, 
+    get_auth_handler, 
     check_authentication, 
     get_auth_header, 
     init_session_state
@@ -25,6 +28,13 @@ from auth.firebase_login import (
 # Configuration
 FASTAPI_URL = os.getenv('FASTAPI_URL', 'http://localhost:8000')
 
+# Model input columns, in the order the API expects them
+FEATURE_COLS = ["Time"] + [f"V{i}" for i in range(1, 29)] + ["Amount"]
+
+# The KPI charts are read-only: render them as static images (no hover/zoom handlers
+# or mode bar) so the browser does not re-attach interactivity on every rerun
+STATIC_CHART_CONFIG = {"staticPlot": True, "displayModeBar": False}
+
 # Page config
 # Custom CSS
 st.markdown("""
@@ -66,6 +76,164 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 
+@st.cache_resource
+def get_http_session():
+    """Shared requests.Session so API calls reuse keep-alive connections across reruns.
+    Shared by every user of this server, so auth headers are passed per request."""
+    session = requests.Session()
+    # Room for the concurrent fetch_all requests plus the main script thread
+    adapter = requests.adapters.HTTPAdapter(pool_connections=10, pool_maxsize=10)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+@st.cache_resource
+def get_http_executor():
+    """Threads for issuing independent API requests concurrently"""
+    return ThreadPoolExecutor(max_workers=4)
+
+
+def _get(session, url, headers=None, timeout=5):
+    """GET url, returning None instead of raising on connection errors"""
+    try:
+        return session.get(url, headers=headers, timeout=timeout)
+    except requests.exceptions.RequestException:
+        return None
+
+
+# Read-only API lookups are cached for 30 s so widget reruns skip the round trip.
+# Arguments are plain strings (the bearer token, not the headers dict) to keep them
+# hashable.
+@st.cache_data(ttl=30, show_spinner=False)
+def fetch_all(url, token):
+    """Stats and profile, requested concurrently (None where a call failed)"""
+    headers = {"Authorization": f"Bearer {token}"} if token else {}
+    session = get_http_session()
+    executor = get_http_executor()
+    stats = executor.submit(_get, session, f"{url}/api/stats", headers)
+    profile = executor.submit(_get, session, f"{url}/api/user/profile", headers)
+    
+    def json_or_none(response):
+        return response.json() if response is not None and response.status_code == 200 else None
+    
+    return {
+        'stats': json_or_none(stats.result()),
+        'profile': json_or_none(profile.result())
+    }
+
+
+@st.cache_data(ttl=10, show_spinner=False)
+def fetch_health(url):
+    """Status code of GET /health, or None if the API is unreachable"""
+    response = _get(get_http_session(), f"{url}/health", timeout=1)
+    return response.status_code if response is not None else None
+
+
+@st.cache_data(ttl=30, show_spinner=False)
+def fetch_model_info(url):
+    """GET /debug-model-info"""
+    response = get_http_session().get(f"{url}/debug-model-info", timeout=5)
+    response.raise_for_status()
+    return response.json()
+
+
+# Per-session copies of fetched results, so switching pages within a session does not
+# even consult the shared cache; st.cache_data above shares fetches across users
+SESSION_CACHE_SECONDS = 30
+
+
+def session_cached(name, key, fetch):
+    """fetch() result kept in st.session_state under name; refetched after
+    SESSION_CACHE_SECONDS or when key (e.g. the signed-in user's token) changes"""
+    entry = st.session_state.get(name)
+    now = time.monotonic()
+    if entry is None or entry[1] != key or now - entry[0] > SESSION_CACHE_SECONDS:
+        entry = (now, key, fetch())
+        st.session_state[name] = entry
+    return entry[2]
+
+
+# Plotly figures are built from hashable inputs and memoized. st.cache_resource hands
+# back the same Figure object; st.cache_data would pickle it, and unpickling a Figure
+# re-runs Plotly's property validation, which is most of the construction cost.
+# Callers only render the returned figures and never mutate them.
+@st.cache_resource(show_spinner=False)
+def build_pie(values):
+    """Legitimate vs fraudulent donut for a (legit, fraud) tuple"""
+    labels = ["Legitimate", "Fraudulent"]
+    colors = ["#00C851", "#ff4444"]
+    
+    fig = go.Figure(data=[go.Pie(
+        labels=labels,
+        values=list(values),
+        hole=0.4,
+        marker=dict(colors=colors)
+    )])
+    fig.update_layout(height=300)
+    return fig
+
+
+# Headline model metrics (%) shown on the dashboard
+PERF_METRICS = ('Precision', 'Recall', 'F1-Score', 'AUC-ROC')
+PERF_SCORES = (95.3, 89.7, 92.4, 97.8)
+
+
+@st.cache_resource(show_spinner=False)
+def build_perf_bar():
+    """Horizontal bar of the model's headline metrics"""
+    fig = go.Figure(data=[
+        go.Bar(
+            x=PERF_SCORES,
+            y=PERF_METRICS,
+            orientation='h',
+            marker=dict(color='#667eea')
+        )
+    ])
+    fig.update_layout(height=300, xaxis_title="Score (%)", yaxis_title="")
+    return fig
+
+
+# Gauge bands as (start %, end %, colour)
+GAUGE_STEPS = ((0, 50, "#e0e0e0"), (50, 70, "#ffeb3b"), (70, 100, "#ff5252"))
+
+
+@st.cache_data(show_spinner=False, max_entries=1024)
+def render_gauge(prob, threshold, is_fraud):
+    """Static SVG half-dial for a fraud probability; prob and threshold are percentages,
+    rounded to 0.1 by the caller so repeat predictions hit the cache"""
+    def point(value, radius):
+        angle = math.pi * (1 - min(max(value, 0), 100) / 100)
+        return 100 + radius * math.cos(angle), 100 - radius * math.sin(angle)
+    
+    parts = ['<svg viewBox="0 0 200 125" width="100%" height="220" xmlns="http://www.w3.org/2000/svg">']
+    for start, end, color in GAUGE_STEPS:
+        (x0, y0), (x1, y1) = point(start, 80), point(end, 80)
+        parts.append(f'<path d="M {x0:.1f} {y0:.1f} A 80 80 0 0 1 {x1:.1f} {y1:.1f}" stroke="{color}" stroke-width="18" fill="none"/>')
+    
+    (tx0, ty0), (tx1, ty1) = point(threshold, 68), point(threshold, 92)
+    parts.append(f'<line x1="{tx0:.1f}" y1="{ty0:.1f}" x2="{tx1:.1f}" y2="{ty1:.1f}" stroke="black" stroke-width="3"/>')
+    
+    nx, ny = point(prob, 70)
+    needle = "#ff4444" if is_fraud else "#00C851"
+    parts.append(f'<line x1="100" y1="100" x2="{nx:.1f}" y2="{ny:.1f}" stroke="{needle}" stroke-width="4" stroke-linecap="round"/>')
+    parts.append('<circle cx="100" cy="100" r="5" fill="#333"/>')
+    parts.append(f'<text x="100" y="122" text-anchor="middle" font-size="14" font-weight="bold">{prob:.1f}%</text>')
+    parts.append('</svg>')
+    return "".join(parts)
+
+
+@st.fragment(run_every="10s")
+def render_health_badge():
+    """API connection status, refreshed on its own every 10 s without rerunning the page"""
+    health = fetch_health(FASTAPI_URL)
+    if health == 200:
+        st.success("🟢 API Connected")
+    elif health is not None:
+        st.error("🔴 API Error")
+    else:
+        st.error("🔴 API Offline")
+
 
 def render_sidebar():
     """Render sidebar with user info and navigation"""
@@ -87,19 +255,12 @@ def render_sidebar():
             st.markdown("---")
             
             # Connection status
-            try:
-                response = requests.get(f"{FASTAPI_URL}/health", timeout=2)
-                if response.status_code == 200:
-                    st.success("🟢 API Connected")
-                else:
-                    st.error("🔴 API Error")
-            except:
-                st.error("🔴 API Offline")
+            render_health_badge()
             
             st.markdown("---")
             
             # Sign out button
-            auth_handler = FirebaseAuth()
+            auth_handler = get_auth_handler()
             if st.button("🚪 Sign Out", use_container_width=True):
                 auth_handler.sign_out()
             
@@ -112,21 +273,14 @@ def render_dashboard_page():
     """Main dashboard with statistics"""
     st.markdown('<h1 class="main-header">🛡️ FraudDetectPro Dashboard</h1>', unsafe_allow_html=True)
     
-    headers = get_auth_header()
+    if st.button("🔄 Refresh"):
+        fetch_all.clear()
+        st.session_state.pop('api_results', None)
+        st.rerun()
     
-    # Fetch stats
-    try:
-        response = requests.get(f"{FASTAPI_URL}/api/stats", headers=headers, timeout=5)
-        if response.status_code == 200:
-            stats = response.json()
-        else:
-            stats = {
-                "total_predictions": 0,
-                "fraud_detected": 0,
-                "fraud_ratio": 0.0,
-                "model_accuracy": 95.3
-            }
-    except:
+    # Stats fetched by main()
+    stats = st.session_state.api['stats']
+    if stats is None:
         stats = {
             "total_predictions": 0,
             "fraud_detected": 0,
@@ -175,43 +329,19 @@ def render_dashboard_page():
         st.subheader("📊 Prediction Distribution")
         
         if stats['total_predictions'] > 0:
-            labels = ["Legitimate", "Fraudulent"]
-            values = [
+            fig = build_pie((
                 stats['total_predictions'] - stats['fraud_detected'],
                 stats['fraud_detected']
-            ]
-            colors = ["#00C851", "#ff4444"]
-            
-            fig = go.Figure(data=[go.Pie(
-                labels=labels,
-                values=values,
-                hole=0.4,
-                marker=dict(colors=colors)
-            )])
-            fig.update_layout(height=300)
-            st.plotly_chart(fig, use_container_width=True)
+            ))
+            st.plotly_chart(fig, use_container_width=True, key="dash_pie", config=STATIC_CHART_CONFIG)
         else:
             st.info("No predictions yet. Try the Test Prediction page!")
     
     with col2:
         st.subheader("🎯 Model Performance")
         
-        metrics_data = {
-            'Metric': ['Precision', 'Recall', 'F1-Score', 'AUC-ROC'],
-            'Score': [95.3, 89.7, 92.4, 97.8]
-        }
-        df = pd.DataFrame(metrics_data)
-        
-        fig = go.Figure(data=[
-            go.Bar(
-                x=df['Score'],
-                y=df['Metric'],
-                orientation='h',
-                marker=dict(color='#667eea')
-            )
-        ])
-        fig.update_layout(height=300, xaxis_title="Score (%)", yaxis_title="")
-        st.plotly_chart(fig, use_container_width=True)
+        fig = build_perf_bar()
+        st.plotly_chart(fig, use_container_width=True, key="dash_perf_bar", config=STATIC_CHART_CONFIG)
     
     # Model Architecture Info
     st.markdown("---")
@@ -244,6 +374,45 @@ def render_dashboard_page():
         """)
 
 
+def sample_rng(kind):
+    """Seeded generator for the 'legit' or 'fraud' sample button, kept in session state so
+    it survives reruns: each click draws a new vector, and every session replays the same
+    sequence. The two buttons use independent streams."""
+    key = f"sample_rng_{kind}"
+    if key not in st.session_state:
+        st.session_state[key] = np.random.default_rng([0, 0 if kind == "legit" else 1])
+    return st.session_state[key]
+
+
+def render_prediction_result(result):
+    """Show a /predict response: verdict, metrics and probability gauge"""
+    # Display result
+    st.markdown("---")
+    st.subheader("🎯 Prediction Result")
+    
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        is_fraud = result['prediction'] == "Fraudulent"
+        prob = result['probability'] * 100
+        
+        if is_fraud:
+            st.markdown(f'<div class="fraud-alert">⚠️ FRAUDULENT<br/>Risk Score: {prob:.1f}%</div>', unsafe_allow_html=True)
+        else:
+            st.markdown(f'<div class="safe-alert">✓ LEGITIMATE<br/>Risk Score: {prob:.1f}%</div>', unsafe_allow_html=True)
+    
+    with col2:
+        st.metric("Probability", f"{prob:.2f}%")
+        st.metric("Threshold Used", f"{result['threshold_used']*100:.1f}%")
+        st.metric("Hybrid Features", result['hybrid_feature_count'])
+    
+    # Probability gauge: a small static SVG instead of a Plotly indicator
+    st.markdown(
+        render_gauge(round(prob, 1), round(result['threshold_used'] * 100, 1), is_fraud),
+        unsafe_allow_html=True
+    )
+
+
 def render_prediction_page():
     """Test prediction page"""
     st.markdown('<h1 class="main-header">🔍 Test Fraud Prediction</h1>', unsafe_allow_html=True)
@@ -273,18 +442,19 @@ def render_prediction_page():
             
             # Create V1-V28 inputs in an expander
             with st.expander("🔢 Enter V1-V28 Features (click to expand)", expanded=False):
-                v_features = []
-                for i in range(1, 29):
-                    col_idx = (i - 1) % 4
-                    if col_idx == 0:
-                        cols = st.columns(4)
-                    v_val = cols[col_idx].number_input(
-                        f"V{i}", 
-                        value=0.0, 
-                        format="%.6f",
-                        key=f"v{i}"
-                    )
-                    v_features.append(v_val)
+                # One editable 1x28 row instead of 28 separate number_input widgets
+                v_columns = [f"V{i}" for i in range(1, 29)]
+                edited = st.data_editor(
+                    pd.DataFrame([[0.0] * 28], columns=v_columns),
+                    num_rows="fixed",
+                    hide_index=True,
+                    column_config={
+                        col: st.column_config.NumberColumn(col, format="%.6f")
+                        for col in v_columns
+                    },
+                    key="v_features"
+                )
+                v_features = edited.iloc[0].astype(float).tolist()
             
             # Quick test buttons
             st.markdown("**Or use sample data:**")
@@ -299,20 +469,21 @@ def render_prediction_page():
                 # Prepare features
                 if use_legit:
                     # Sample legitimate transaction
-                    features = [0.0] + [np.random.randn() * 0.5 for _ in range(28)] + [50.0]
+                    features = np.concatenate(([0.0], sample_rng("legit").standard_normal(28) * 0.5, [50.0])).tolist()
                 elif use_fraud:
                     # Sample fraud transaction (exaggerated features)
-                    features = [50000.0] + [np.random.randn() * 3 for _ in range(28)] + [2500.0]
+                    features = np.concatenate(([50000.0], sample_rng("fraud").standard_normal(28) * 3, [2500.0])).tolist()
                 else:
                     # User input
                     features = [time] + v_features + [amount]
                 
                 # Make prediction
                 headers = get_auth_header()
+                st.session_state.prediction_result = None
                 
                 with st.spinner("Analyzing transaction..."):
                     try:
-                        response = requests.post(
+                        response = get_http_session().post(
                             f"{FASTAPI_URL}/predict",
                             json={"features": features},
                             headers=headers,
@@ -320,50 +491,7 @@ def render_prediction_page():
                         )
                         
                         if response.status_code == 200:
-                            result = response.json()
-                            
-                            # Display result
-                            st.markdown("---")
-                            st.subheader("🎯 Prediction Result")
-                            
-                            col1, col2 = st.columns(2)
-                            
-                            with col1:
-                                is_fraud = result['prediction'] == "Fraudulent"
-                                prob = result['probability'] * 100
-                                
-                                if is_fraud:
-                                    st.markdown(f'<div class="fraud-alert">⚠️ FRAUDULENT<br/>Risk Score: {prob:.1f}%</div>', unsafe_allow_html=True)
-                                else:
-                                    st.markdown(f'<div class="safe-alert">✓ LEGITIMATE<br/>Risk Score: {prob:.1f}%</div>', unsafe_allow_html=True)
-                            
-                            with col2:
-                                st.metric("Probability", f"{prob:.2f}%")
-                                st.metric("Threshold Used", f"{result['threshold_used']*100:.1f}%")
-                                st.metric("Hybrid Features", result['hybrid_feature_count'])
-                            
-                            # Probability gauge
-                            fig = go.Figure(go.Indicator(
-                                mode="gauge+number",
-                                value=prob,
-                                title={'text': "Fraud Probability"},
-                                gauge={
-                                    'axis': {'range': [0, 100]},
-                                    'bar': {'color': "#ff4444" if is_fraud else "#00C851"},
-                                    'steps': [
-                                        {'range': [0, 50], 'color': "#e0e0e0"},
-                                        {'range': [50, 70], 'color': "#ffeb3b"},
-                                        {'range': [70, 100], 'color': "#ff5252"}
-                                    ],
-                                    'threshold': {
-                                        'line': {'color': "black", 'width': 4},
-                                        'thickness': 0.75,
-                                        'value': result['threshold_used'] * 100
-                                    }
-                                }
-                            ))
-                            fig.update_layout(height=300)
-                            st.plotly_chart(fig, use_container_width=True)
+                            st.session_state.prediction_result = response.json()
                             
                         else:
                             st.error(f"Prediction failed: {response.json().get('detail', 'Unknown error')}")
@@ -372,6 +500,10 @@ def render_prediction_page():
                         st.error("⏱️ Request timed out. Please ensure the API is running.")
                     except Exception as e:
                         st.error(f"❌ Error: {str(e)}")
+            
+            # The last result stays on the page across reruns and page switches
+            if st.session_state.get('prediction_result') is not None:
+                render_prediction_result(st.session_state.prediction_result)
     
     with tab2:
         st.subheader("📁 Batch Prediction from CSV")
@@ -380,12 +512,43 @@ def render_prediction_page():
         
         if uploaded_file is not None:
             try:
-                df = pd.read_csv(uploaded_file)
-                st.write(f"Loaded {len(df)} transactions")
-                st.dataframe(df.head())
+                # Preview only parses the first rows (the pyarrow engine has no nrows)
+                st.dataframe(pd.read_csv(uploaded_file, nrows=5))
                 
                 if st.button("🔮 Predict All"):
-                    st.info("Batch prediction coming soon!")
+                    # Full file is read only on demand, with the multithreaded pyarrow parser
+                    uploaded_file.seek(0)
+                    df = pd.read_csv(uploaded_file, engine="pyarrow")
+                    st.write(f"Loaded {len(df)} transactions")
+                    
+                    missing = [col for col in FEATURE_COLS if col not in df.columns]
+                    if missing:
+                        st.error(f"CSV is missing columns: {', '.join(missing)}")
+                    else:
+                        # One request for the whole file: raw float32 rows instead of a
+                        # JSON list of numbers per transaction
+                        payload = df[FEATURE_COLS].to_numpy(dtype="<f4").tobytes()
+                        headers = {
+                            **get_auth_header(),
+                            "Content-Type": "application/octet-stream",
+                            "X-Shape": f"{len(df)},{len(FEATURE_COLS)}"
+                        }
+                        
+                        with st.spinner(f"Analyzing {len(df)} transactions..."):
+                            response = get_http_session().post(
+                                f"{FASTAPI_URL}/predict_batch/raw",
+                                data=payload,
+                                headers=headers,
+                                timeout=60
+                            )
+                        
+                        if response.status_code == 200:
+                            results = pd.DataFrame(response.json()['predictions'])
+                            results.insert(0, "Amount", df["Amount"].to_numpy())
+                            st.metric("Flagged as Fraudulent", int((results['prediction'] == "Fraudulent").sum()))
+                            st.dataframe(results[["Amount", "prediction", "probability"]])
+                        else:
+                            st.error(f"Batch prediction failed: {response.json().get('detail', 'Unknown error')}")
             except Exception as e:
                 st.error(f"Error reading CSV: {e}")
 
@@ -395,31 +558,29 @@ def render_model_info_page():
     st.markdown('<h1 class="main-header">📈 Model Information</h1>', unsafe_allow_html=True)
     
     try:
-        response = requests.get(f"{FASTAPI_URL}/debug-model-info", timeout=5)
-        if response.status_code == 200:
-            info = response.json()
-            
-            col1, col2 = st.columns(2)
-            
-            with col1:
-                st.subheader("🔧 Model Configuration")
-                st.json({
-                    "Input Features": info['expected_input_features'],
-                    "Hybrid Features": info['expected_hybrid_features'],
-                    "Optimal Threshold": info['optimal_threshold'],
-                    "Scaler Loaded": info['scaler_loaded'],
-                    "Firebase Initialized": info['firebase_initialized']
-                })
-            
-            with col2:
-                st.subheader("🧠 Neural Network Layers")
-                for i, layer in enumerate(info['nn_model_layers'], 1):
-                    st.text(f"{i}. {layer}")
-            
-            st.subheader("📊 Feature Extractor")
-            st.info(f"Output Shape: {info['feature_extractor_output_shape']}")
-        else:
-            st.error("Could not fetch model information")
+        info = session_cached('model_info', FASTAPI_URL, lambda: fetch_model_info(FASTAPI_URL))
+        
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            st.subheader("🔧 Model Configuration")
+            st.json({
+                "Input Features": info['expected_input_features'],
+                "Hybrid Features": info['expected_hybrid_features'],
+                "Optimal Threshold": info['optimal_threshold'],
+                "Scaler Loaded": info['scaler_loaded'],
+                "Firebase Initialized": info['firebase_initialized']
+            })
+        
+        with col2:
+            st.subheader("🧠 Neural Network Layers")
+            for i, layer in enumerate(info['nn_model_layers'], 1):
+                st.text(f"{i}. {layer}")
+        
+        st.subheader("📊 Feature Extractor")
+        st.info(f"Output Shape: {info['feature_extractor_output_shape']}")
+    except requests.exceptions.HTTPError:
+        st.error("Could not fetch model information")
     except Exception as e:
         st.error(f"Error: {e}")
 
@@ -433,7 +594,7 @@ def render_settings_page():
     
     if st.button("🧪 Test Connection"):
         try:
-            response = requests.get(f"{FASTAPI_URL}/health", timeout=3)
+            response = get_http_session().get(f"{FASTAPI_URL}/health", timeout=3)
             if response.status_code == 200:
                 data = response.json()
                 st.success("✓ Connection successful!")
@@ -446,17 +607,14 @@ def render_settings_page():
     st.markdown("---")
     
     st.subheader("User Information")
-    headers = get_auth_header()
     
     if st.button("📋 View Profile"):
-        try:
-            response = requests.get(f"{FASTAPI_URL}/api/user/profile", headers=headers, timeout=5)
-            if response.status_code == 200:
-                st.json(response.json())
-            else:
-                st.error("Could not fetch profile")
-        except Exception as e:
-            st.error(f"Error: {e}")
+        # Profile fetched by main()
+        profile = st.session_state.api['profile']
+        if profile is not None:
+            st.json(profile)
+        else:
+            st.error("Could not fetch profile")
 
 
 def main():
@@ -467,6 +625,10 @@ def main():
     if not check_authentication():
         return
     
+    # Stats and profile in one concurrent round, read by the pages below
+    token = st.session_state.id_token
+    st.session_state.api = session_cached('api_results', token, lambda: fetch_all(FASTAPI_URL, token))
+    
     # Render sidebar and get selected page
     page = render_sidebar()
     
@@ -259,7 +259,6 @@ class TransactionSender:
             result = self.send_transaction(transaction)
             if result:
                 results.append(result)
-            time.sleep(0.1)  # Small delay between requests
         
         return results
     
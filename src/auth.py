@@ -1,79 +1,88 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from jose import JWTError, jwt
+import jwt  # PyJWT
 from passlib.context import CryptContext
 from datetime import datetime, timedelta
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
 from fastapi import Security
 from fastapi.security import OAuth2PasswordBearer
-from jose import JWTError, jwt
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
-def get_current_user(token: str = Security(oauth2_scheme)):
+async def get_current_user(token: str = Security(oauth2_scheme)):
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        role: str = payload.get("role")
-        if username is None or role is None:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid authentication credentials",
-                headers={"WWW-Authenticate": "Bearer"},
-            )
-        return {"username": username, "role": role}
-    except JWTError:
+        payload = jwt.decode(
+            token, SECRET_BYTES, algorithms=[ALGORITHM],
+            options={"require": ["exp", "sub", "role"]},
+        )
+    except jwt.MissingRequiredClaimError:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid authentication credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    except jwt.InvalidTokenError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid or expired token",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    return {"username": payload["sub"], "role": payload["role"]}
 
 # Router for auth endpoints
 router = APIRouter()
 
 # Secret key for JWT (replace with env variable in production)
 SECRET_KEY = "frauddetectpro_secret_key"
+SECRET_BYTES = SECRET_KEY.encode()  # HMAC key, encoded once rather than per token
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# BCRYPT_ROUNDS sets the cost factor for new hashes (12 by default; 4 keeps tests fast)
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
 
-# Dummy user storage for now (replace with DB later)
-fake_users_db = {
-    "analyst@example.com": {
-        "username": "analyst@example.com",
-        "hashed_password": pwd_context.hash("password123"),
-        "role": "fraud_analyst",
-    },
-    "admin@example.com": {
-        "username": "admin@example.com",
-        "hashed_password": pwd_context.hash("adminpass"),
-        "role": "admin",
-    },
-}
+# Password hashing - singleton: build the context once at import (bcrypt backend
+# detection is not free) and import it from here rather than constructing another
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+
+# Password checks run here, off the event loop. bcrypt releases the GIL while hashing,
+# so threads already spread logins over all cores without a process pool's pickling.
+password_executor = ThreadPoolExecutor(max_workers=os.cpu_count() or 1, thread_name_prefix="bcrypt")
+
+# Dummy user storage for now (replace with DB later). Stored column-wise, one list per
+# field, with a username -> row index; roles are codes into ROLE_NAMES
+ROLE_NAMES = ("fraud_analyst", "admin")
+usernames = ["analyst@example.com", "admin@example.com"]
+hashed_pw = [pwd_context.hash("password123"), pwd_context.hash("adminpass")]
+roles = [0, 1]
+_user_index = {username: i for i, username in enumerate(usernames)}
 
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
 
 def authenticate_user(username: str, password: str):
-    user = fake_users_db.get(username)
-    if not user:
+    i = _user_index.get(username)
+    if i is None:
         return None
-    if not verify_password(password, user["hashed_password"]):
+    if not verify_password(password, hashed_pw[i]):
         return None
-    return user
+    return {"username": usernames[i], "role": ROLE_NAMES[roles[i]]}
 
 def create_access_token(data: dict, expires_delta: timedelta = None):
     to_encode = data.copy()
     expire = datetime.utcnow() + (expires_delta or timedelta(minutes=15))
     to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    encoded_jwt = jwt.encode(to_encode, SECRET_BYTES, algorithm=ALGORITHM)
     return encoded_jwt
 
 @router.post("/login")
-def login(form_data: OAuth2PasswordRequestForm = Depends()):
-    user = authenticate_user(form_data.username, form_data.password)
+async def login(form_data: OAuth2PasswordRequestForm = Depends()):
+    # bcrypt verification is CPU-bound; run it off the event loop
+    user = await asyncio.get_running_loop().run_in_executor(
+        password_executor, authenticate_user, form_data.username, form_data.password
+    )
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
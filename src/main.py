@@ -7,14 +7,14 @@ from fastapi.responses import RedirectResponse
 
 app = FastAPI()
 @app.get("/")
-def root():
+async def root():
     return RedirectResponse(url="/dashboard")
 # Include authentication routes
 app.include_router(auth.router, prefix="/auth", tags=["Authentication"])
 
 # Protected dashboard route
 @app.get("/dashboard")
-def dashboard(user: dict = Depends(get_current_user)):
+async def dashboard(user: dict = Depends(get_current_user)):
     return {
         "message": f"Welcome to the Fraud Detection Dashboard, {user['username']}!",
         "role": user["role"]
@@ -30,7 +30,7 @@ def custom_openapi():
         description="API for Fraud Detection Dashboard with JWT Authentication",
         routes=app.routes,
     )
-    openapi_schema["components"]["securitySchemes"] = {
+    openapi_schema.setdefault("components", {})["securitySchemes"] = {
         "BearerAuth": {
             "type": "http",
             "scheme": "bearer",
@@ -44,3 +44,9 @@ def custom_openapi():
     return app.openapi_schema
 
 app.openapi = custom_openapi
+
+# Build the schema once at startup so the first /openapi.json request doesn't walk the routes
+@app.on_event("startup")
+async def build_openapi_schema():
+    app.openapi_schema = None
+    custom_openapi()